@@ -1,24 +1,40 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database.database import get_db
+from app.database.database import get_async_db
 from app.models.models import User
 from app.schemas.schemas import TokenData
+from app.auth.hashing import pwd_context
+from app.auth.user_cache import AuthenticatedUser, user_cache
 import os
+import secrets
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
+# Incluir id y estado del usuario en el token para no consultar la tabla users en cada petición
+TOKEN_USER_CLAIMS = os.getenv("TOKEN_USER_CLAIMS", "false").lower() in ("1", "true", "yes")
+# Los claims solo se creen durante este tiempo tras emitir el token; después se vuelve a la
+# caché o la base de datos. Acota cuánto tarda otro worker en ver una desactivación
+TOKEN_CLAIMS_MAX_AGE_SECONDS = float(os.getenv("TOKEN_CLAIMS_MAX_AGE_SECONDS", "300"))
+# Tickets del stream SSE: van en la URL (EventSource no admite cabeceras), así que caducan pronto
+EVENTS_TICKET_EXPIRE_SECONDS = int(os.getenv("EVENTS_TICKET_EXPIRE_SECONDS", "60"))
+EVENTS_TICKET_PURPOSE = "events"
+# Usuarios con acceso a las rutas de administración (lista separada por comas; vacía = nadie)
+ADMIN_USERNAMES = {name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()}
+# Token estático para el scraper de /metrics (vacío = solo administradores)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verificar si una contraseña coincide con el hash"""
+    """Verificar si una contraseña coincide con el hash (síncrono; las rutas usan app.auth.hashing)"""
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
@@ -32,14 +48,46 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_events_ticket(username: str) -> str:
+    """Ticket de corta duración que solo vale para abrir el stream de eventos"""
+    return create_access_token(
+        {"sub": username, "purpose": EVENTS_TICKET_PURPOSE},
+        expires_delta=timedelta(seconds=EVENTS_TICKET_EXPIRE_SECONDS)
+    )
+
 def get_user_by_username(db: Session, username: str):
     """Obtener usuario por nombre de usuario"""
     return db.query(User).filter(User.username == username).first()
 
+async def get_user_by_username_async(db: AsyncSession, username: str):
+    """Obtener usuario por nombre de usuario (sesión asíncrona)"""
+    return await db.scalar(select(User).filter(User.username == username).limit(1))
+
+def token_claims(user: User) -> dict:
+    """Claims del token de acceso de un usuario"""
+    claims = {"sub": user.username}
+    if TOKEN_USER_CLAIMS:
+        claims.update({"uid": user.id, "active": bool(user.is_active)})
+    return claims
+
+def _user_from_claims(payload: dict) -> Optional[AuthenticatedUser]:
+    """Usuario embebido en el token, salvo que haya cambiado después de emitirse o sea antiguo
+
+    ``changed_since`` solo ve los cambios hechos en este proceso; la edad máxima
+    cubre los de otros workers o los hechos directamente en la base de datos.
+    """
+    if not TOKEN_USER_CLAIMS or "uid" not in payload or "active" not in payload:
+        return None
+    if time.time() - payload.get("iat", 0) > TOKEN_CLAIMS_MAX_AGE_SECONDS:
+        return None
+    if user_cache.changed_since(payload["sub"], payload.get("iat", 0)):
+        return None
+    return AuthenticatedUser(id=payload["uid"], username=payload["sub"], is_active=payload["active"])
+
 def authenticate_user(db: Session, username: str, password: str):
     """Autenticar un usuario"""
     user = get_user_by_username(db, username)
@@ -49,8 +97,13 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Obtener el usuario actual desde el token JWT"""
+async def user_from_token(token: str, db: AsyncSession, purpose: Optional[str] = None) -> AuthenticatedUser:
+    """Usuario de un token JWT (claims, caché o base de datos); 401 si no es válido
+
+    ``purpose`` distingue los tickets de vida corta (p. ej. ``events``) de los
+    tokens de acceso: ninguno de los dos se acepta en lugar del otro. Un ticket
+    puede reutilizarse hasta que caduca (EVENTS_TICKET_EXPIRE_SECONDS).
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -59,19 +112,39 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("purpose") != purpose:
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
     
-    user = get_user_by_username(db, username=token_data.username)
+    user = _user_from_claims(payload) or user_cache.get(token_data.username)
     if user is None:
-        raise credentials_exception
+        db_user = await get_user_by_username_async(db, username=token_data.username)
+        if db_user is None:
+            raise credentials_exception
+        user = AuthenticatedUser.from_user(db_user)
+        user_cache.set(user)
     return user
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> AuthenticatedUser:
+    """Obtener el usuario actual desde el token JWT (claims, caché o base de datos)"""
+    return await user_from_token(token, db)
+
+async def get_current_active_user(current_user: AuthenticatedUser = Depends(get_current_user)):
     """Verificar que el usuario actual esté activo"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_current_admin_user(current_user: AuthenticatedUser = Depends(get_current_active_user)):
+    """Verificar que el usuario actual sea administrador (ADMIN_USERNAMES)"""
+    if current_user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return current_user
+
+async def require_metrics_access(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> None:
+    """Acceso a /metrics: el token METRICS_TOKEN del scraper o un administrador"""
+    if METRICS_TOKEN and secrets.compare_digest(token, METRICS_TOKEN):
+        return
+    await get_current_admin_user(await get_current_active_user(await user_from_token(token, db)))
\ No newline at end of file
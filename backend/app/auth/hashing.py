@@ -0,0 +1,99 @@
+"""Hash y verificación de contraseñas en un pool acotado, fuera del event loop y del threadpool"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from typing import Optional
+import asyncio
+import os
+import time
+from passlib.context import CryptContext
+from app.utils.metrics import Counter, Gauge, Histogram
+from app.utils.request_metrics import add_password_hash_time
+
+# "thread" (bcrypt libera el GIL) o "process"
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread").lower()
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Peticiones que pueden esperar un worker libre antes de responder 503
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", str(PASSWORD_HASH_WORKERS * 8)))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+HASH_SECONDS = Histogram(
+    "password_hash_seconds", "Time spent hashing or verifying a password in the worker",
+    labelnames=("operation",), buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+)
+HASH_WAIT_SECONDS = Histogram(
+    "password_hash_queue_wait_seconds", "Time a password operation waited for a free worker",
+    labelnames=("operation",)
+)
+HASH_IN_FLIGHT = Gauge("password_hash_in_flight", "Password operations running or queued")
+HASH_REJECTED = Counter("password_hash_rejected_total", "Password operations rejected because the queue was full", labelnames=("operation",))
+
+class PasswordHashingBusy(Exception):
+    """No hay hueco en el pool de hashing: el cliente debe reintentar"""
+
+_executor: Optional[Executor] = None
+_executor_lock = Lock()
+_slots = BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE)
+
+def _get_executor() -> Executor:
+    """Crear el pool al primer uso (no al importar, para no hacer fork en cada import)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if PASSWORD_HASH_EXECUTOR == "process":
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+        return _executor
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+# Funciones de módulo para que el pool de procesos pueda serializarlas
+def _timed_hash(password: str, submitted: float):
+    started = time.perf_counter()
+    return pwd_context.hash(password), started - submitted, time.perf_counter() - started
+
+def _timed_verify(plain_password: str, hashed_password: str, submitted: float):
+    started = time.perf_counter()
+    return pwd_context.verify(plain_password, hashed_password), started - submitted, time.perf_counter() - started
+
+def _release_slot(future=None) -> None:
+    HASH_IN_FLIGHT.dec()
+    _slots.release()
+
+async def _run(operation: str, func, *args):
+    if not _slots.acquire(blocking=False):
+        HASH_REJECTED.inc(operation=operation)
+        raise PasswordHashingBusy()
+    HASH_IN_FLIGHT.inc()
+    submitted = time.perf_counter()
+    try:
+        # perf_counter no es comparable entre procesos: allí la espera no se mide
+        future = _get_executor().submit(func, *args, submitted)
+    except BaseException:
+        _release_slot()
+        raise
+    # El hueco se libera cuando termina el trabajo, aunque se cancele la petición que esperaba
+    future.add_done_callback(_release_slot)
+    try:
+        result, waited, elapsed = await asyncio.wrap_future(future)
+    finally:
+        # Lo que la petición estuvo esperando, cola incluida (desglose de Server-Timing)
+        add_password_hash_time(time.perf_counter() - submitted)
+    if PASSWORD_HASH_EXECUTOR != "process":
+        HASH_WAIT_SECONDS.observe(waited, operation=operation)
+    HASH_SECONDS.observe(elapsed, operation=operation)
+    return result
+
+async def hash_password(password: str) -> str:
+    """Generar el hash de una contraseña en el pool de hashing"""
+    return await _run("hash", _timed_hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verificar una contraseña contra su hash en el pool de hashing"""
+    return await _run("verify", _timed_verify, plain_password, hashed_password)
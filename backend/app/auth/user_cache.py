@@ -0,0 +1,140 @@
+"""Caché en proceso del usuario autenticado, indexada por el subject del token"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Optional
+import os
+import time
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.models.models import User
+from app.utils.metrics import Callback
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Campos del usuario que necesitan las rutas, sin sesión ni carga perezosa
+
+    ``email`` y ``created_at`` faltan cuando el usuario sale de los claims del token.
+    """
+    id: int
+    username: str
+    is_active: bool
+    email: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthenticatedUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            is_active=bool(user.is_active),
+            email=user.email,
+            created_at=user.created_at
+        )
+
+class UserCache:
+    """LRU con TTL de usuarios autenticados, con contadores de aciertos y fallos
+
+    Además recuerda cuándo cambió cada usuario, para que los tokens con claims
+    emitidos antes del cambio vuelvan a consultar la base de datos. La caché es
+    por proceso: con varios workers el TTL acota cuánto tarda en verse un cambio.
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._changed: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, username: str) -> Optional[AuthenticatedUser]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[1] <= self.clock():
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, user: AuthenticatedUser) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[user.username] = (user, self.clock() + self.ttl)
+            self._entries.move_to_end(user.username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, username: str) -> None:
+        """Olvidar al usuario y anotar el momento del cambio (hora de pared, como el iat)"""
+        with self._lock:
+            self._entries.pop(username, None)
+            self._changed[username] = time.time()
+            self._changed.move_to_end(username)
+            while len(self._changed) > max(self.maxsize, 1):
+                self._changed.popitem(last=False)
+
+    def changed_since(self, username: str, issued_at: float) -> bool:
+        """El usuario cambió después de emitirse un token con ese ``iat``"""
+        with self._lock:
+            changed = self._changed.get(username)
+        return changed is not None and changed >= issued_at
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._changed.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+user_cache = UserCache()
+
+Callback("user_cache_hits_total", "Authenticated user cache hits", lambda: user_cache.hits, kind="counter")
+Callback("user_cache_misses_total", "Authenticated user cache misses", lambda: user_cache.misses, kind="counter")
+Callback("user_cache_evictions_total", "Users evicted from the cache by the LRU", lambda: user_cache.evictions, kind="counter")
+Callback("user_cache_entries", "Users currently cached", lambda: len(user_cache._entries))
+
+def _changed_usernames(target: User) -> set:
+    """Nombre actual y, si se renombró, el anterior"""
+    usernames = {target.username}
+    history = inspect(target).attrs.username.history
+    usernames.update(name for name in history.deleted or () if name)
+    return usernames
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    session = Session.object_session(target)
+    for username in _changed_usernames(target):
+        user_cache.invalidate(username)
+        # Repetir tras el commit: otra petición pudo volver a cachear el valor viejo entre medias
+        if session is not None:
+            session.info.setdefault("user_cache_invalidate", set()).add(username)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for username in session.info.pop("user_cache_invalidate", ()):
+        user_cache.invalidate(username)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_invalidations(session):
+    session.info.pop("user_cache_invalidate", None)
@@ -0,0 +1,115 @@
+"""Comandos de mantenimiento: python -m app.cli <comando>"""
+import argparse
+import logging
+from app.database.database import SessionLocal
+from app.models import models  # noqa: F401  (registrar los modelos)
+from app.schemas.schemas import ExportFormat
+
+logger = logging.getLogger(__name__)
+
+def rebuild_streaks(args):
+    """Reconstruir el estado de rachas desnormalizado de los hábitos"""
+    from app.utils.streaks import rebuild_streak_states
+
+    db = SessionLocal()
+    try:
+        processed = rebuild_streak_states(db, batch_size=args.batch_size, user_id=args.user_id)
+    finally:
+        db.close()
+    print(f"Streak state rebuilt for {processed} habits")
+
+def rebuild_bitmaps(args):
+    """Reconstruir los bitmaps de completados a partir de habit_logs"""
+    from app.utils.bitmap import rebuild_bitmaps as rebuild
+
+    db = SessionLocal()
+    try:
+        processed = rebuild(db, batch_size=args.batch_size, user_id=args.user_id)
+    finally:
+        db.close()
+    print(f"Completion bitmaps rebuilt for {processed} habits")
+
+def rebuild_rollups(args):
+    """Reconstruir los acumulados semanales por hábito y diarios por usuario desde habit_logs"""
+    from app.utils.rollups import rebuild_rollups as rebuild
+
+    db = SessionLocal()
+    try:
+        processed = rebuild(db, batch_size=args.batch_size, user_id=args.user_id)
+    finally:
+        db.close()
+    print(f"Rollups rebuilt for {processed} users")
+
+def import_logs(args):
+    """Importar logs históricos de un archivo CSV/NDJSON (opcionalmente gzip) para un usuario"""
+    from app.models.models import User
+    from app.utils.log_import import ImportReport, detect_format, import_chunk, open_text, validated_chunks
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == args.user).first()
+        if user is None:
+            raise SystemExit(f"User '{args.user}' not found")
+        report = ImportReport()
+        with open(args.file, "rb") as binary:
+            stream = open_text(binary)
+            for chunk in validated_chunks(stream, args.format or detect_format(args.file), report, args.habit_id, args.chunk_size):
+                import_chunk(db, user.id, chunk, report)
+                db.commit()
+                print(f"{report.processed} rows processed, {report.created} created, {report.updated} updated, {report.error_count} errors")
+    finally:
+        db.close()
+    for error in report.summary()["errors"]:
+        print(f"row {error['row']}: {error['detail']}")
+    # Las cachés de respuestas del servidor no se invalidan desde aquí: caducan por TTL
+    print(f"Imported {report.created + report.updated} of {report.processed} rows ({report.skipped} skipped, {report.error_count} errors)")
+
+def audit_queries(args):
+    """Auditar los planes de las consultas calientes sobre un conjunto de datos sembrado"""
+    from app.utils.query_audit import HOT_PATHS, run_audit
+
+    violations = run_audit(args.database_url, args.path)
+    for violation in violations:
+        print(violation)
+    if violations:
+        raise SystemExit(f"{len(violations)} hot queries do a full table scan")
+    print(f"Query plans OK for {len(args.path or HOT_PATHS)} hot paths")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Habit Tracker maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_streaks = subparsers.add_parser("rebuild-streaks", help="Backfill/repair streak state for existing habits")
+    parser_streaks.add_argument("--batch-size", type=int, default=500)
+    parser_streaks.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's habits")
+    parser_streaks.set_defaults(func=rebuild_streaks)
+
+    parser_bitmaps = subparsers.add_parser("rebuild-bitmaps", help="Backfill/repair per-habit completion bitmaps")
+    parser_bitmaps.add_argument("--batch-size", type=int, default=500)
+    parser_bitmaps.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's habits")
+    parser_bitmaps.set_defaults(func=rebuild_bitmaps)
+
+    parser_rollups = subparsers.add_parser("rebuild-rollups", help="Backfill/repair weekly and daily completion rollups")
+    parser_rollups.add_argument("--batch-size", type=int, default=500)
+    parser_rollups.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's rollups")
+    parser_rollups.set_defaults(func=rebuild_rollups)
+
+    parser_import = subparsers.add_parser("import-logs", help="Bulk import historical logs from a CSV/NDJSON file")
+    parser_import.add_argument("file", help="CSV or NDJSON file, optionally gzip-compressed (an /api/export file works)")
+    parser_import.add_argument("--user", required=True, help="Username that owns the habits")
+    parser_import.add_argument("--format", type=ExportFormat, choices=list(ExportFormat), default=None, help="Default: from the file extension")
+    parser_import.add_argument("--habit-id", type=int, default=None, help="Habit for rows without habit_id")
+    parser_import.add_argument("--chunk-size", type=int, default=1000)
+    parser_import.set_defaults(func=import_logs)
+
+    parser_audit = subparsers.add_parser("audit-queries", help="Fail if a registered hot query does a full table scan")
+    parser_audit.add_argument("--database-url", default="sqlite://", help="Scratch database to seed (default: in-memory SQLite)")
+    parser_audit.add_argument("--path", action="append", default=None, help="Only audit this hot path (repeatable)")
+    parser_audit.set_defaults(func=audit_queries)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,105 @@
-from sqlalchemy import create_engine
+from collections import OrderedDict
+from threading import Lock
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 import os
+import time
 from dotenv import load_dotenv
+from app.database.pool import engine_options, instrument_pool
+from app.utils.metrics import Counter
+from app.utils.query_stats import instrument_queries
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Driver asíncrono equivalente al driver síncrono de DATABASE_URL
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mariadb": "mariadb+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    """URL con el driver asíncrono del mismo backend (pymysql -> aiomysql, pysqlite -> aiosqlite)"""
+    url = make_url(url)
+    if url.get_dialect().is_async:
+        return url.render_as_string(hide_password=False)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+# Réplica de lectura opcional para los GET (estadísticas, listados, historial)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+ASYNC_DATABASE_REPLICA_URL = os.getenv("ASYNC_DATABASE_REPLICA_URL") or (
+    async_database_url(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+)
+# Tras escribir, las lecturas del mismo cliente van al primario durante este tiempo
+DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+
+# Motor síncrono: arranque, migraciones y comandos de mantenimiento
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, "primary_sync"))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_pool(engine, "primary_sync")
+instrument_queries(engine)
+
+# Motor asíncrono: rutas de la API
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, "primary", is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+instrument_pool(async_engine, "primary")
+instrument_queries(async_engine)
+
+replica_engine = None
+ReplicaSessionLocal = None
+if ASYNC_DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(
+        ASYNC_DATABASE_REPLICA_URL, **engine_options(ASYNC_DATABASE_REPLICA_URL, "replica", is_async=True)
+    )
+    ReplicaSessionLocal = async_sessionmaker(replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    instrument_pool(replica_engine, "replica")
+    instrument_queries(replica_engine)
+
+READS_ROUTED = Counter("db_reads_routed_total", "Read-only requests by the database they were sent to", labelnames=("target",))
+
+class RecentWriters:
+    """Clientes que confirmaron una escritura hace poco (read-your-writes), acotado por LRU"""
+
+    def __init__(self, ttl: float = DB_REPLICA_STICKY_SECONDS, maxsize: int = 100000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = Lock()
+
+    def mark(self, key: str) -> None:
+        with self._lock:
+            self._expires[key] = time.monotonic() + self.ttl
+            self._expires.move_to_end(key)
+            while len(self._expires) > self.maxsize:
+                self._expires.popitem(last=False)
+
+    def is_recent(self, key) -> bool:
+        if key is None:
+            return False
+        with self._lock:
+            expires = self._expires.get(key)
+            if expires is not None and expires <= time.monotonic():
+                del self._expires[key]
+                expires = None
+        return expires is not None
+
+recent_writers = RecentWriters()
+
+@event.listens_for(Session, "after_commit")
+def _mark_recent_writer(session):
+    # El commit ocurre antes de enviar la respuesta, así que la siguiente lectura ya lo ve
+    writer = session.info.get("writer")
+    if writer is not None:
+        recent_writers.mark(writer)
 
 Base = declarative_base()
 
@@ -20,5 +110,28 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        # Identificar al cliente (su token) para la regla de read-your-writes
+        db.info["writer"] = request.headers.get("authorization")
+        yield db
+
+def read_sessionmaker(request: Request) -> async_sessionmaker:
+    """Fábrica de sesiones de lectura: la réplica, salvo que el cliente acabe de escribir"""
+    if ReplicaSessionLocal is None or recent_writers.is_recent(request.headers.get("authorization")):
+        READS_ROUTED.inc(target="primary")
+        return AsyncSessionLocal
+    READS_ROUTED.inc(target="replica")
+    return ReplicaSessionLocal
+
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Sesión para handlers de solo lectura (ver read_sessionmaker)"""
+    session_factory = read_sessionmaker(request)
+    if session_factory is AsyncSessionLocal:
+        yield db
+        return
+    async with session_factory() as replica:
+        yield replica
+
 def init_db():
     Base.metadata.create_all(bind=engine)
\ No newline at end of file
@@ -0,0 +1,143 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from app.database.database import Base, SessionLocal
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _add_missing_columns(conn, table) -> list:
+    """Agregar a una tabla existente las columnas nuevas del modelo"""
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        added.append(f"{table.name}.{column.name}")
+    return added
+
+def _create_missing_indexes(conn, table) -> list:
+    """Crear en una tabla existente los índices nuevos del modelo"""
+    existing = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+    created = []
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        index.create(conn)
+        created.append(f"{table.name}.{index.name}")
+    return created
+
+def _has_unique_index(conn, table_name: str, columns: list) -> bool:
+    """La tabla ya tiene una restricción o índice único sobre esas columnas"""
+    inspector = inspect(conn)
+    for constraint in inspector.get_unique_constraints(table_name):
+        if constraint["column_names"] == columns:
+            return True
+    for index in inspector.get_indexes(table_name):
+        if index["unique"] and index["column_names"] == columns:
+            return True
+    return False
+
+def _deduplicate_habit_logs(conn) -> int:
+    """Dejar un solo log por (habit_id, date) antes de crear el índice único
+
+    Se conserva el log más antiguo; queda completado si alguno de los duplicados
+    lo estaba y conserva la primera nota no vacía.
+    """
+    groups = conn.execute(text(
+        "SELECT habit_id, date, MIN(id) AS keep_id, "
+        "MAX(CASE WHEN completed THEN 1 ELSE 0 END) AS any_completed "
+        "FROM habit_logs GROUP BY habit_id, date HAVING COUNT(*) > 1"
+    )).all()
+    for habit_id, log_date, keep_id, any_completed in groups:
+        notes = conn.execute(text(
+            "SELECT notes FROM habit_logs WHERE habit_id = :habit_id AND date = :date "
+            "AND notes IS NOT NULL AND notes <> '' ORDER BY id LIMIT 1"
+        ), {"habit_id": habit_id, "date": log_date}).scalar()
+        conn.execute(text(
+            "UPDATE habit_logs SET completed = :completed, notes = :notes WHERE id = :id"
+        ), {"completed": bool(any_completed), "notes": notes, "id": keep_id})
+        conn.execute(text(
+            "DELETE FROM habit_logs WHERE habit_id = :habit_id AND date = :date AND id <> :id"
+        ), {"habit_id": habit_id, "date": log_date, "id": keep_id})
+    return len(groups)
+
+def _backfill_streak_state():
+    """Poblar el estado de rachas de los hábitos que existían antes de la columna"""
+    from app.utils.streaks import rebuild_streak_states
+
+    db = SessionLocal()
+    try:
+        processed = rebuild_streak_states(db)
+        logger.info("Streak state rebuilt for %s habits", processed)
+    finally:
+        db.close()
+
+def _backfill_bitmaps():
+    """Poblar los bitmaps de completados a partir de los logs existentes"""
+    from app.utils.bitmap import rebuild_bitmaps
+
+    db = SessionLocal()
+    try:
+        processed = rebuild_bitmaps(db)
+        logger.info("Completion bitmaps rebuilt for %s habits", processed)
+    finally:
+        db.close()
+
+def _backfill_rollups():
+    """Poblar los acumulados semanales y diarios a partir de los logs existentes"""
+    from app.utils.rollups import rebuild_rollups
+
+    db = SessionLocal()
+    try:
+        processed = rebuild_rollups(db)
+        logger.info("Rollups rebuilt for %s users", processed)
+    finally:
+        db.close()
+
+def _rollups_missing(conn) -> bool:
+    """Hay logs completados pero la tabla de acumulados diarios sigue vacía"""
+    has_rollups = conn.execute(text("SELECT 1 FROM user_daily_rollups LIMIT 1")).first()
+    has_logs = conn.execute(text("SELECT 1 FROM habit_logs WHERE completed = :completed LIMIT 1"), {"completed": True}).first()
+    return has_logs is not None and has_rollups is None
+
+def _bitmaps_missing(conn) -> bool:
+    """Hay logs completados pero la tabla de bitmaps sigue vacía"""
+    has_bitmaps = conn.execute(text("SELECT 1 FROM habit_completion_bitmaps LIMIT 1")).first()
+    has_logs = conn.execute(text("SELECT 1 FROM habit_logs WHERE completed = :completed LIMIT 1"), {"completed": True}).first()
+    return has_logs is not None and has_bitmaps is None
+
+def run_migrations(engine) -> list:
+    """Aplicar los cambios de esquema que create_all no hace sobre tablas existentes"""
+    applied = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            applied.extend(_add_missing_columns(conn, table))
+            applied.extend(_create_missing_indexes(conn, table))
+        logs_merged = 0
+        if not _has_unique_index(conn, "habit_logs", ["habit_id", "date"]):
+            logs_merged = _deduplicate_habit_logs(conn)
+            conn.execute(text("CREATE UNIQUE INDEX uq_habit_logs_habit_date ON habit_logs (habit_id, date)"))
+            applied.append("habit_logs.uq_habit_logs_habit_date")
+        bitmaps_missing = _bitmaps_missing(conn)
+        rollups_missing = _rollups_missing(conn)
+
+    for name in applied:
+        logger.info("Applied schema change %s", name)
+    if logs_merged:
+        logger.info("Merged %s groups of duplicated (habit_id, date) logs", logs_merged)
+
+    if bitmaps_missing or logs_merged:
+        _backfill_bitmaps()
+        applied.append("habit_completion_bitmaps")
+
+    # Los duplicados fusionados pudieron inflar los totales incrementales
+    if "habits.current_streak" in applied or logs_merged:
+        _backfill_streak_state()
+
+    if rollups_missing or logs_merged:
+        _backfill_rollups()
+        applied.append("rollups")
+
+    return applied
@@ -0,0 +1,71 @@
+"""Configuración del pool de conexiones desde el entorno y sus métricas"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import os
+import time
+from app.utils.metrics import Counter, Gauge, Histogram
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Reciclar antes del wait_timeout de MySQL hace innecesario el ping en cada checkout
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection (including connecting)",
+    labelnames=("pool",), buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+)
+POOL_CHECKOUT_TIMEOUTS = Counter("db_pool_checkout_timeouts_total", "Checkouts that hit DB_POOL_TIMEOUT", labelnames=("pool",))
+POOL_IN_USE = Gauge("db_pool_connections_in_use", "Connections currently checked out of the pool", labelnames=("pool",))
+
+class _TimedCheckout:
+    """Medir cuánto tarda cada checkout; el nombre del pool (logging_name) es la etiqueta"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(pool=self.logging_name)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, pool=self.logging_name)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def engine_options(url: str, name: str, is_async: bool = False) -> dict:
+    """Argumentos de create_engine para el pool según el entorno
+
+    SQLite conserva el pool por defecto de su driver (memoria compartida en un
+    solo hilo, archivo sin pool en aiosqlite); el resto usa un QueuePool medido.
+    """
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_logging_name": name}
+    if make_url(url).get_backend_name() == "sqlite":
+        return options
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT
+    )
+    return options
+
+def instrument_pool(engine, name: str) -> None:
+    """Contar las conexiones en uso del engine (sync o async)"""
+    engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_IN_USE.inc(pool=name)
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        POOL_IN_USE.dec(pool=name)
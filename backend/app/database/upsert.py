@@ -0,0 +1,49 @@
+from typing import Dict, Iterable, Optional
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+MYSQL_DIALECTS = ("mysql", "mariadb")
+
+def _dialect_insert(dialect: str, model):
+    """INSERT propio del dialecto, que es el que sabe generar la cláusula de upsert"""
+    if dialect in MYSQL_DIALECTS:
+        return mysql.insert(model)
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"Upsert is not supported for dialect '{dialect}'")
+
+def upsert(
+    db: Session,
+    model,
+    conflict_columns: Iterable[str],
+    update_columns: Iterable[str] = (),
+    update_values: Optional[Dict[str, object]] = None,
+    values: Optional[Dict[str, object]] = None,
+    increment_columns: Iterable[str] = (),
+):
+    """Construir un INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE en una sola sentencia
+
+    ``update_columns`` toma el valor de la fila que se intentó insertar;
+    ``increment_columns`` le suma ese valor al existente (contadores);
+    ``update_values`` son expresiones libres sobre la fila existente. Sin
+    ``values`` la sentencia sirve para executemany (upsert multi-fila).
+    """
+    dialect = db.get_bind().dialect.name
+    statement = _dialect_insert(dialect, model)
+    if values is not None:
+        statement = statement.values(**values)
+
+    proposed = statement.inserted if dialect in MYSQL_DIALECTS else statement.excluded
+    set_ = {name: getattr(proposed, name) for name in update_columns}
+    set_.update({name: getattr(model, name) + getattr(proposed, name) for name in increment_columns})
+    set_.update(update_values or {})
+
+    if dialect in MYSQL_DIALECTS:
+        return statement.on_duplicate_key_update(set_)
+    return statement.on_conflict_do_update(index_elements=list(conflict_columns), set_=set_)
+
+def supports_returning(db: Session) -> bool:
+    """El dialecto permite RETURNING en INSERT ... ON CONFLICT"""
+    return db.get_bind().dialect.name not in MYSQL_DIALECTS
@@ -1,8 +1,17 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app.auth.auth import require_metrics_access
+from app.auth.hashing import shutdown_executor
 from app.database.database import Base, engine
-from app.routes import auth, habits, logs, stats
+from app.database.migrations import run_migrations
+from app.routes import admin, auth, data, events, habits, logs, stats
 from app.models import models
+from app.utils.metrics import render_metrics
+from app.utils.request_metrics import RequestMetricsMiddleware
+from app.utils.rollups import ROLLUP_RECONCILE_SECONDS, reconcile_rollups
+from app.utils.scheduler import scheduler
 import logging
 import time
 
@@ -10,29 +19,14 @@ import time
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title="Habit Tracker API",
-    version="1.0.0",
-    description="API for tracking daily habits and building streaks 🌱"
-)
-
-# Configurar CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # Crear tablas al iniciar
-@app.on_event("startup")
-def startup_event():
+def create_tables():
     max_retries = 5
     retry_count = 0
     while retry_count < max_retries:
         try:
             Base.metadata.create_all(bind=engine)
+            run_migrations(engine)
             logger.info("Database tables created successfully!")
             break
         except Exception as e:
@@ -44,19 +38,47 @@ def startup_event():
                 logger.error("Max retries reached. Exiting...")
                 raise
 
-# Middleware para logging de requests
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"Incoming request: {request.method} {request.url}")
-    response = await call_next(request)
-    logger.info(f"Outgoing response: Status {response.status_code}")
-    return response
+# Tareas periódicas (arrancan con la aplicación)
+scheduler.add("reconcile_rollups", ROLLUP_RECONCILE_SECONDS, reconcile_rollups)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    create_tables()
+    scheduler.start()
+    try:
+        yield
+    finally:
+        await scheduler.stop()
+        shutdown_executor()
+
+app = FastAPI(
+    title="Habit Tracker API",
+    version="1.0.0",
+    description="API for tracking daily habits and building streaks 🌱",
+    lifespan=lifespan
+)
+
+# Configurar CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Next-Cursor"],
+)
+
+# Métricas por ruta, Server-Timing (SQL y hashing) y log de acceso muestreado
+app.add_middleware(RequestMetricsMiddleware)
 
 # Incluir todas las rutas
 app.include_router(auth.router)
 app.include_router(habits.router)
 app.include_router(logs.router)
 app.include_router(stats.router)
+app.include_router(data.router)
+app.include_router(events.router)
+app.include_router(admin.router)
 
 @app.get("/")
 def read_root():
@@ -67,6 +89,11 @@ def read_root():
         "docs": "/docs"
     }
 
+# Privado: expone rutas, tamaños de caché y tiempos internos (METRICS_TOKEN o administrador)
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False, dependencies=[Depends(require_metrics_access)])
+def metrics():
+    return render_metrics()
+
 @app.get("/health")
 def health_check():
     return {
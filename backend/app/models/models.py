@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Date, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Date, LargeBinary, Index, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
@@ -15,6 +15,7 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     habits = relationship("Habit", back_populates="owner", cascade="all, delete-orphan")
+    daily_rollups = relationship("UserDailyRollup", back_populates="user", cascade="all, delete-orphan")
 
 class CategoryEnum(str, enum.Enum):
     health = "health"
@@ -28,6 +29,12 @@ class CategoryEnum(str, enum.Enum):
 
 class Habit(Base):
     __tablename__ = "habits"
+    __table_args__ = (
+        # Listados y conteos por usuario, con o sin filtro de activos
+        Index("ix_habits_user_active", "user_id", "is_active"),
+        # Paginación por cursor sobre (created_at, id)
+        Index("ix_habits_user_created", "user_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
@@ -39,11 +46,24 @@ class Habit(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
     
+    # Estado de rachas desnormalizado, actualizado en cada escritura de logs
+    current_streak = Column(Integer, default=0, server_default="0", nullable=False)
+    longest_streak = Column(Integer, default=0, server_default="0", nullable=False)
+    last_completed = Column(Date)
+    total_completions = Column(Integer, default=0, server_default="0", nullable=False)
+    
     owner = relationship("User", back_populates="habits")
     logs = relationship("HabitLog", back_populates="habit", cascade="all, delete-orphan")
+    bitmaps = relationship("HabitCompletionBitmap", back_populates="habit", cascade="all, delete-orphan")
+    weekly_rollups = relationship("HabitWeeklyRollup", back_populates="habit", cascade="all, delete-orphan")
 
 class HabitLog(Base):
     __tablename__ = "habit_logs"
+    __table_args__ = (
+        UniqueConstraint("habit_id", "date", name="uq_habit_logs_habit_date"),
+        # Conteos, tasas y rachas: habit_id + completed + rango de fechas, cubierto por el índice
+        Index("ix_habit_logs_habit_completed_date", "habit_id", "completed", "date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     habit_id = Column(Integer, ForeignKey("habits.id"))
@@ -52,4 +72,48 @@ class HabitLog(Base):
     notes = Column(String(500))
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    habit = relationship("Habit", back_populates="logs")
\ No newline at end of file
+    habit = relationship("Habit", back_populates="logs")
+
+class HabitCompletionBitmap(Base):
+    __tablename__ = "habit_completion_bitmaps"
+    __table_args__ = (
+        UniqueConstraint("habit_id", "year", name="uq_habit_bitmaps_habit_year"),
+    )
+    
+    # Un bit por día del año: 1 si el hábito se completó ese día
+    id = Column(Integer, primary_key=True, index=True)
+    habit_id = Column(Integer, ForeignKey("habits.id"), nullable=False)
+    year = Column(Integer, nullable=False)
+    bits = Column(LargeBinary(46), nullable=False)
+    
+    habit = relationship("Habit", back_populates="bitmaps")
+
+class HabitWeeklyRollup(Base):
+    __tablename__ = "habit_weekly_rollups"
+    __table_args__ = (
+        UniqueConstraint("habit_id", "week_start", name="uq_habit_weekly_rollups_habit_week"),
+    )
+    
+    # Días completados del hábito en la semana que empieza ese lunes
+    id = Column(Integer, primary_key=True, index=True)
+    habit_id = Column(Integer, ForeignKey("habits.id"), nullable=False)
+    week_start = Column(Date, nullable=False)
+    completions = Column(Integer, default=0, server_default="0", nullable=False)
+    
+    habit = relationship("Habit", back_populates="weekly_rollups")
+
+class UserDailyRollup(Base):
+    __tablename__ = "user_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "date", name="uq_user_daily_rollups_user_date"),
+    )
+    
+    # Hábitos completados por el usuario ese día
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    completions = Column(Integer, default=0, server_default="0", nullable=False)
+    # Último incremento: el reconciliador periódico solo revisa los usuarios con cambios recientes
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    user = relationship("User", back_populates="daily_rollups")
\ No newline at end of file
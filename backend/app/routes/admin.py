@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from datetime import datetime, timezone
+from app.auth.auth import get_current_admin_user
+from app.auth.user_cache import AuthenticatedUser
+from app.schemas.schemas import ProfilerStart, ProfilerStatus
+from app.utils import profiler
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+PSTATS_SORT_KEYS = ("cumulative", "tottime", "calls", "ncalls")
+
+def _status(session: profiler.ProfileSession) -> dict:
+    result = session.status()
+    result["started_at"] = datetime.fromtimestamp(result["started_at"], timezone.utc)
+    return result
+
+@router.post("/profiler", response_model=ProfilerStatus, status_code=status.HTTP_201_CREATED)
+async def start_profiler(
+    settings: ProfilerStart,
+    current_user: AuthenticatedUser = Depends(get_current_admin_user)
+):
+    """Perfilar las peticiones (opcionalmente de una ruta) durante un tiempo acotado"""
+    if profiler.active_session is not None and not profiler.active_session.expired():
+        raise HTTPException(status_code=409, detail="A profiling session is already running")
+    if not 0 < settings.duration_seconds <= profiler.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"duration_seconds must be between 0 and {profiler.PROFILER_MAX_SECONDS:g}")
+    if not 0 < settings.sample_rate <= 1:
+        raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+    if not 1 <= settings.interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+    if settings.max_requests is not None and settings.max_requests < 1:
+        raise HTTPException(status_code=400, detail="max_requests must be positive")
+
+    session = profiler.ProfileSession(
+        mode=settings.mode,
+        route=settings.route,
+        duration=settings.duration_seconds,
+        sample_rate=settings.sample_rate,
+        interval=settings.interval_ms / 1000,
+        max_requests=settings.max_requests
+    )
+    try:
+        profiler.start_profiling(session)
+    except profiler.ProfilerUnavailable as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return _status(session)
+
+@router.get("/profiler", response_model=ProfilerStatus)
+async def profiler_status(current_user: AuthenticatedUser = Depends(get_current_admin_user)):
+    """Estado de la sesión en curso o de la última"""
+    if profiler.last_session is None:
+        raise HTTPException(status_code=404, detail="No profiling session")
+    return _status(profiler.last_session)
+
+@router.delete("/profiler", response_model=ProfilerStatus)
+async def stop_profiler(current_user: AuthenticatedUser = Depends(get_current_admin_user)):
+    """Detener la sesión antes de tiempo; los resultados se conservan"""
+    session = profiler.stop_profiling()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profiling session")
+    return _status(session)
+
+@router.get("/profiler/results", response_class=PlainTextResponse)
+async def profiler_results(
+    sort: str = "cumulative",
+    limit: int = 50,
+    current_user: AuthenticatedUser = Depends(get_current_admin_user)
+):
+    """Pilas colapsadas (modo sample) o informe pstats (modo cprofile) de la última sesión"""
+    session = profiler.last_session
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profiling session")
+    if session.mode == profiler.ProfilerMode.sample:
+        return session.collapsed()
+    if sort not in PSTATS_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(PSTATS_SORT_KEYS)}")
+    return session.pstats_text(sort, max(1, limit))
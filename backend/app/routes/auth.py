@@ -1,55 +1,75 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.database import get_async_db
 from app.schemas.schemas import UserCreate, UserResponse, Token, LoginRequest
 from app.models.models import User
+from app.auth import hashing
 from app.auth.auth import (
-    get_password_hash,
-    authenticate_user,
+    get_user_by_username_async,
     create_access_token,
+    token_claims,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     get_current_active_user
 )
+from app.auth.user_cache import AuthenticatedUser
 import logging
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
+def _password_hashing_busy() -> HTTPException:
+    """503 cuando el pool de hashing está lleno, para que una ráfaga de logins no afecte al resto"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Registrar un nuevo usuario"""
+    # El hash de bcrypt va a su propio pool acotado
     try:
     # Verificar si el email ya existe
-            db_user = db.query(User).filter(User.email == user.email).first()
+            db_user = await db.scalar(select(User).filter(User.email == user.email).limit(1))
             if db_user:
                 raise HTTPException(status_code=400, detail="Email already registered")
             
             # Verificar si el username ya existe
-            db_user = db.query(User).filter(User.username == user.username).first()
+            db_user = await db.scalar(select(User).filter(User.username == user.username).limit(1))
             if db_user:
                 raise HTTPException(status_code=400, detail="Username already taken")
             
             # Crear nuevo usuario
-            hashed_password = get_password_hash(user.password)
+            hashed_password = await hashing.hash_password(user.password)
             new_user = User(
                 email=user.email,
                 username=user.username,
                 hashed_password=hashed_password
             )
             db.add(new_user)
-            db.commit()
-            db.refresh(new_user)
+            await db.commit()
+            await db.refresh(new_user)
             return new_user
+    except hashing.PasswordHashingBusy:
+        raise _password_hashing_busy()
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error during registration: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="An error occurred during registration")
 
 @router.post("/login", response_model=Token)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """Iniciar sesión y obtener token JWT"""
-    user = authenticate_user(db, login_data.username, login_data.password)
-    if not user:
+    user = await get_user_by_username_async(db, login_data.username)
+    try:
+        authenticated = user is not None and await hashing.verify_password(login_data.password, user.hashed_password)
+    except hashing.PasswordHashingBusy:
+        raise _password_hashing_busy()
+    if not authenticated:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -58,12 +78,21 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, 
+        data=token_claims(user), 
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_active_user)):
+async def read_users_me(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_active_user)
+):
     """Obtener información del usuario actual"""
+    # Con los claims del token no hay email ni fecha de alta: leer la fila completa
+    if current_user.email is None:
+        user = await db.get(User, current_user.id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
     return current_user
\ No newline at end of file
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import date
+import asyncio
+from app.auth.auth import get_current_active_user
+from app.auth.user_cache import AuthenticatedUser
+from app.database.database import SessionLocal, read_sessionmaker
+from app.schemas.schemas import ExportFormat, ImportResult
+from app.utils.cache import bump_versions
+from app.utils.events import publish
+from app.utils.export import csv_chunks, export_batches, gzip_chunks, ndjson_chunks
+from app.utils.log_import import READ_ERRORS, ImportReport, import_next_chunk, upload_chunks
+
+router = APIRouter(prefix="/api", tags=["Data"])
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_data(
+    request: Request,
+    format: ExportFormat = ExportFormat.ndjson,
+    compress: bool = False,
+    current_user: AuthenticatedUser = Depends(get_current_active_user)
+):
+    """Exportar todos los hábitos y logs del usuario en streaming (opcionalmente en gzip)"""
+    session_factory = read_sessionmaker(request)
+    user_id = current_user.id
+
+    async def batches():
+        # Sesión propia: vive lo que dura el envío, no lo que dura el handler
+        async with session_factory() as db:
+            async for batch in export_batches(db, user_id):
+                yield batch
+
+    chunks = ndjson_chunks(batches()) if format == ExportFormat.ndjson else csv_chunks(batches())
+    media_type = MEDIA_TYPES[format]
+    filename = f"habits-{date.today().isoformat()}.{format.value}"
+    if compress:
+        chunks = gzip_chunks(chunks)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(chunks, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@router.post("/import", response_model=ImportResult)
+async def import_logs(
+    request: Request,
+    file: UploadFile = File(...),
+    format: Optional[ExportFormat] = None,
+    habit_id: Optional[int] = None,
+    current_user: AuthenticatedUser = Depends(get_current_active_user)
+):
+    """Importar logs históricos desde CSV o NDJSON (o un export), por bloques de una transacción cada uno
+
+    ``habit_id`` se usa para las filas que no traen el suyo; el formato se deduce
+    de la extensión si no se indica. Los bloques ya confirmados se conservan si
+    uno posterior falla. Cada bloque se lee, valida y escribe en un hilo con una
+    sesión síncrona; entre bloques el worker atiende otras peticiones.
+    """
+    report = ImportReport()
+    # Lectura y detección del formato van en el hilo del primer bloque
+    chunks = upload_chunks(file.file, file.filename, format, report, habit_id)
+    db = SessionLocal()
+    # Como get_async_db: tras importar, las lecturas del cliente van al primario
+    db.info["writer"] = request.headers.get("authorization")
+    try:
+        while await asyncio.to_thread(import_next_chunk, db, current_user.id, chunks, report):
+            pass
+    except READ_ERRORS as error:
+        await asyncio.to_thread(db.rollback)
+        raise HTTPException(status_code=400, detail=f"Could not read the file: {error}")
+    finally:
+        await asyncio.to_thread(db.close)
+        chunks.close()
+        if report.habit_ids:
+            await bump_versions(current_user.id, report.habit_ids)
+            # Demasiados cambios para un delta: los clientes recargan
+            await publish(current_user.id, "resync", {})
+    return report.summary()
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from typing import Optional
+import time
+from app.auth.auth import (
+    EVENTS_TICKET_EXPIRE_SECONDS, EVENTS_TICKET_PURPOSE, create_events_ticket, get_current_active_user, user_from_token
+)
+from app.auth.user_cache import AuthenticatedUser
+from app.database.database import AsyncSessionLocal
+from app.schemas.schemas import EventsTicket
+from app.utils.events import (
+    EVENT_STREAMS, EVENTS_KEEPALIVE_SECONDS, EVENTS_MAX_STREAM_SECONDS, EVENTS_RETRY_MS, subscribe, unsubscribe
+)
+
+router = APIRouter(prefix="/api", tags=["Events"])
+
+@router.post("/events/ticket", response_model=EventsTicket)
+async def create_ticket(current_user: AuthenticatedUser = Depends(get_current_active_user)):
+    """Ticket de corta duración para abrir el stream con EventSource"""
+    return EventsTicket(ticket=create_events_ticket(current_user.username), expires_in=EVENTS_TICKET_EXPIRE_SECONDS)
+
+@router.get("/events", response_class=StreamingResponse)
+async def stream_events(request: Request, ticket: Optional[str] = None):
+    """Stream SSE con los cambios de hábitos y logs del usuario
+
+    EventSource no permite cabeceras: en la URL solo se acepta un ``ticket`` de
+    ``POST /api/events/ticket`` (caduca en segundos y no sirve para otras rutas),
+    nunca el token de acceso, que acabaría en los logs de acceso. Los clientes
+    que sí pueden enviar cabeceras usan el Bearer habitual. Tras el evento
+    ``ready`` el cliente debe recargar lo que muestre; ``resync`` pide lo mismo
+    cuando se han perdido eventos.
+    """
+    scheme, header_token = get_authorization_scheme_param(request.headers.get("authorization"))
+    if scheme.lower() == "bearer" and header_token:
+        token, purpose = header_token, None
+    elif ticket:
+        token, purpose = ticket, EVENTS_TICKET_PURPOSE
+    else:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    # Sesión solo para autenticar: la conexión abierta no retiene ninguna de la base de datos
+    async with AsyncSessionLocal() as db:
+        current_user = await user_from_token(token, db, purpose)
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    user_id = current_user.id
+
+    async def events():
+        # Suscripción dentro del generador: si el cliente no llega a leer, no queda colgada
+        subscription = await subscribe(user_id)
+        EVENT_STREAMS.inc()
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\nevent: ready\ndata: {{}}\n\n"
+            deadline = time.monotonic() + EVENTS_MAX_STREAM_SECONDS
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                message = await subscription.get(min(EVENTS_KEEPALIVE_SECONDS, remaining))
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield message if message is not None else ": keepalive\n\n"
+        finally:
+            EVENT_STREAMS.dec()
+            await unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,41 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database.database import get_db
-from app.schemas.schemas import HabitCreate, HabitUpdate, HabitResponse
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from datetime import datetime
+from app.database.database import get_async_db, get_read_db
+from app.schemas.schemas import HabitCreate, HabitUpdate, HabitResponse, HabitPage
 from app.models.models import Habit, User
 from app.auth.auth import get_current_active_user
+from app.utils.cache import bump_versions
+from app.utils.conditional import conditional_get
+from app.utils.events import has_listeners, publish
+from app.utils.query_stats import query_budget
+from app.utils.fast_json import fetch_all, list_response, list_select, sparse_fields
+from app.utils.rollups import remove_habit_from_rollups
+from app.utils.pagination import MAX_PAGE_SIZE, after, decode_cursor, keyset_page, page_size
 
 router = APIRouter(prefix="/api/habits", tags=["Habits"])
 
-@router.get("/", response_model=List[HabitResponse])
-def get_habits(
+async def _publish_habit(user_id: int, habit: Habit) -> None:
+    """Enviar el hábito creado o editado a los streams SSE del usuario"""
+    if has_listeners(user_id):
+        await publish(user_id, "habit.updated", HabitResponse.model_validate(habit).model_dump(mode="json"))
+
+@router.get("/", response_model=Union[List[HabitResponse], HabitPage], dependencies=[Depends(query_budget(2)), Depends(conditional_get)])
+async def get_habits(
     skip: int = 0,
-    limit: int = 100,
+    limit: Optional[int] = None,
     active_only: bool = True,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    response: Response = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Obtener todos los hábitos del usuario"""
-    query = db.query(Habit).filter(Habit.user_id == current_user.id)
+    """Obtener los hábitos del usuario
+
+    Con ``cursor`` (vacío para la primera página) pagina por (created_at, id) y
+    devuelve ``{items, next_cursor}``; sin él se mantiene el modo heredado por offset.
+    ``fields=name,color`` lee y devuelve solo esas columnas (más ``id``).
+    """
+    fields = sparse_fields(fields, HabitResponse)
+    query = list_select(Habit, HabitResponse, fields, extra=("created_at",)).filter(Habit.user_id == current_user.id)
     
     if active_only:
         query = query.filter(Habit.is_active == True)
     
-    habits = query.offset(skip).limit(limit).all()
-    return habits
+    if cursor is None:
+        limit = min(limit if limit is not None else 100, MAX_PAGE_SIZE)
+        habits = await fetch_all(db, query.offset(skip).limit(limit), fields)
+        return list_response(habits, response, fields)
+    
+    size = page_size(limit)
+    position = decode_cursor("habits", cursor, (datetime, int))
+    if position:
+        query = query.filter(after((Habit.created_at, Habit.id), position))
+    habits = await fetch_all(db, query.order_by(Habit.created_at, Habit.id).limit(size + 1), fields)
+    return list_response(keyset_page("habits", habits, size, lambda habit: (habit.created_at, habit.id)), response, fields)
 
-@router.get("/{habit_id}", response_model=HabitResponse)
-def get_habit(
+@router.get("/{habit_id}", response_model=HabitResponse, dependencies=[Depends(query_budget(2)), Depends(conditional_get)])
+async def get_habit(
     habit_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Obtener un hábito específico"""
-    habit = db.query(Habit).filter(
+    habit = await db.scalar(select(Habit).filter(
         Habit.id == habit_id,
         Habit.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
@@ -43,30 +75,32 @@ def get_habit(
     return habit
 
 @router.post("/", response_model=HabitResponse, status_code=status.HTTP_201_CREATED)
-def create_habit(
+async def create_habit(
     habit: HabitCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Crear un nuevo hábito"""
     new_habit = Habit(**habit.dict(), user_id=current_user.id)
     db.add(new_habit)
-    db.commit()
-    db.refresh(new_habit)
+    await db.commit()
+    await bump_versions(current_user.id)
+    await db.refresh(new_habit)
+    await _publish_habit(current_user.id, new_habit)
     return new_habit
 
 @router.put("/{habit_id}", response_model=HabitResponse)
-def update_habit(
+async def update_habit(
     habit_id: int,
     habit_update: HabitUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Actualizar un hábito existente"""
-    habit = db.query(Habit).filter(
+    habit = await db.scalar(select(Habit).filter(
         Habit.id == habit_id,
         Habit.user_id == current_user.id
-    ).first()
+    ).limit(1))
     
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
@@ -75,25 +109,31 @@ def update_habit(
     for key, value in update_data.items():
         setattr(habit, key, value)
     
-    db.commit()
-    db.refresh(habit)
+    await db.commit()
+    await bump_versions(current_user.id, [habit_id])
+    await db.refresh(habit)
+    await _publish_habit(current_user.id, habit)
     return habit
 
 @router.delete("/{habit_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_habit(
+async def delete_habit(
     habit_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Eliminar un hábito"""
-    habit = db.query(Habit).filter(
+    # Bloqueo como en las escrituras de logs: el reconciliador de acumulados espera
+    habit = await db.scalar(select(Habit).filter(
         Habit.id == habit_id,
         Habit.user_id == current_user.id
-    ).first()
+    ).with_for_update().limit(1))
     
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
     
-    db.delete(habit)
-    db.commit()
+    await db.run_sync(remove_habit_from_rollups, habit)
+    await db.delete(habit)
+    await db.commit()
+    await bump_versions(current_user.id, [habit_id])
+    await publish(current_user.id, "habit.deleted", {"id": habit_id})
     return None
\ No newline at end of file
@@ -1,143 +1,275 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import and_, not_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from datetime import date, timedelta
-from app.database.database import get_db
-from app.schemas.schemas import HabitLogCreate, HabitLogUpdate, HabitLogResponse
-from app.models.models import HabitLog, Habit, User
+from app.database.database import async_engine, get_async_db, get_read_db
+from app.database.upsert import MYSQL_DIALECTS, supports_returning, upsert
+from app.schemas.schemas import (
+    HabitLogCreate, HabitLogUpdate, HabitLogResponse, HabitLogPage,
+    HabitHeatmap, HeatmapEncoding, HeatmapResponse,
+    HabitLogBatchRequest, HabitLogBatchResponse
+)
+from app.models.models import HabitLog, Habit, HabitCompletionBitmap, User
 from app.auth.auth import get_current_active_user
+from app.utils.bitmap import CompletionHistory
+from app.utils.cache import bump_versions
+from app.utils.log_batch import apply_log_operations
+from app.utils.log_changes import apply_log_change
+from app.utils.conditional import conditional_get
+from app.utils.events import has_listeners, publish_log_changes
+from app.utils.query_stats import query_budget
+from app.utils.fast_json import fetch_all, list_response, list_select, sparse_fields
+from app.utils.ownership import owns_habit
+from app.utils.pagination import MAX_PAGE_SIZE, after, decode_cursor, keyset_page, page_size
 
 router = APIRouter(prefix="/api/logs", tags=["Habit Logs"])
 
-@router.get("/habits/{habit_id}/logs", response_model=List[HabitLogResponse])
-def get_habit_logs(
+MAX_HEATMAP_DAYS = 3660
+MAX_LOG_DAYS = 3660
+MAX_BATCH_OPERATIONS = 1000
+
+def toggle_query_budget(dialect: str) -> int:
+    """Peor caso de consultas de un toggle en el dialecto
+
+    Usuario (sin caché), hábito, upsert, bitmap (leer y escribir), rachas
+    recalculadas desde los bitmaps, acumulados semanal y diario, hábito, releer
+    el log y tasa de cumplimiento del delta SSE: 11. Sin RETURNING (MySQL) el
+    upsert necesita además un SELECT.
+    """
+    return 12 if dialect in MYSQL_DIALECTS else 11
+
+TOGGLE_QUERY_BUDGET = toggle_query_budget(async_engine.dialect.name)
+
+def _log_event(log: HabitLog) -> dict:
+    return HabitLogResponse.model_validate(log).model_dump(mode="json")
+
+@router.get("/habits/{habit_id}/logs", response_model=Union[List[HabitLogResponse], HabitLogPage], dependencies=[Depends(query_budget(3)), Depends(conditional_get)])
+async def get_habit_logs(
     habit_id: int,
-    days: int = 30,
-    db: Session = Depends(get_db),
+    days: int = Query(30, ge=1, le=MAX_LOG_DAYS),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    response: Response = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
+    """Logs de un hábito en los últimos ``days`` días (``fields=date,completed`` para solo esas columnas)
+
+    Sin ``cursor`` devuelve como mucho los MAX_PAGE_SIZE más recientes; si la
+    ventana tiene más, la cabecera ``X-Next-Cursor`` trae el cursor para seguir
+    con ``cursor=`` (vacío para la primera página), que recorre la ventana completa.
+    """
+    fields = sparse_fields(fields, HabitLogResponse)
     # Verificar que el hábito pertenece al usuario
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
-    if not habit:
+    if not await owns_habit(db, current_user.id, habit_id):
         raise HTTPException(status_code=404, detail="Habit not found")
     
     start_date = date.today() - timedelta(days=days)
-    logs = db.query(HabitLog).filter(
+    query = list_select(HabitLog, HabitLogResponse, fields, extra=("date",)).filter(
         HabitLog.habit_id == habit_id,
         HabitLog.date >= start_date
-    ).order_by(HabitLog.date.desc()).all()
-    return logs
+    )
+    if cursor is None:
+        logs = await fetch_all(db, query.order_by(HabitLog.date.desc(), HabitLog.id.desc()).limit(MAX_PAGE_SIZE + 1), fields)
+        page = keyset_page("logs", logs, MAX_PAGE_SIZE, lambda log: (log.date, log.id))
+        # La lista heredada no tiene dónde indicar que está cortada: los clientes lo ven en la cabecera
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return list_response(page["items"], response, fields)
+    
+    # Con cursor (vacío para la primera página): páginas por (date, id) descendente
+    size = page_size(limit)
+    position = decode_cursor("logs", cursor, (date, int))
+    if position:
+        query = query.filter(after((HabitLog.date, HabitLog.id), position, descending=True))
+    logs = await fetch_all(db, query.order_by(HabitLog.date.desc(), HabitLog.id.desc()).limit(size + 1), fields)
+    return list_response(keyset_page("logs", logs, size, lambda log: (log.date, log.id)), response, fields)
+
+@router.get("/heatmap", response_model=HeatmapResponse, response_model_exclude_none=True, dependencies=[Depends(query_budget(2)), Depends(conditional_get)])
+async def get_heatmap(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    habit_ids: Optional[List[int]] = Query(None),
+    encoding: HeatmapEncoding = HeatmapEncoding.bits,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Matriz de completados por día de todos los hábitos del usuario en una sola consulta"""
+    end = end or date.today()
+    start = start or end - timedelta(days=364)
+    if start > end or (end - start).days >= MAX_HEATMAP_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must be between 1 and {MAX_HEATMAP_DAYS} days")
+    
+    # Hábitos del usuario con los bitmaps de los años del rango (si los tienen)
+    query = select(Habit.id, HabitCompletionBitmap.year, HabitCompletionBitmap.bits).outerjoin(
+        HabitCompletionBitmap,
+        and_(
+            HabitCompletionBitmap.habit_id == Habit.id,
+            HabitCompletionBitmap.year.between(start.year, end.year)
+        )
+    ).filter(Habit.user_id == current_user.id)
+    if habit_ids:
+        query = query.filter(Habit.id.in_(habit_ids))
+    
+    bitmaps = {}
+    for habit_id, year, bits in (await db.execute(query.order_by(Habit.id))).all():
+        years = bitmaps.setdefault(habit_id, {})
+        if year is not None:
+            years[year] = bits
+    
+    habits = []
+    for habit_id, years in bitmaps.items():
+        history = CompletionHistory(years)
+        if encoding == HeatmapEncoding.rle:
+            habits.append(HabitHeatmap(habit_id=habit_id, runs=history.runs(start, end)))
+        else:
+            habits.append(HabitHeatmap(habit_id=habit_id, days=history.days(start, end)))
+    
+    return HeatmapResponse(start=start, end=end, encoding=encoding, habits=habits)
 
 @router.post("/habits/{habit_id}/logs", response_model=HabitLogResponse, status_code=status.HTTP_201_CREATED)
-def create_habit_log(
+async def create_habit_log(
     habit_id: int,
     log: HabitLogCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    # Verificar que el hábito pertenece al usuario
-    habit = db.query(Habit).filter(
+    # Verificar que el hábito pertenece al usuario (bloqueando su estado de rachas)
+    habit = await db.scalar(select(Habit).filter(
         Habit.id == habit_id,
         Habit.user_id == current_user.id
-    ).first()
+    ).with_for_update().limit(1))
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
     
-    # Verificar si ya existe un log para esa fecha
-    existing_log = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.date == log.date
-    ).first()
-    
-    if existing_log:
-        raise HTTPException(status_code=400, detail="Log already exists for this date")
-    
+    # El índice único (habit_id, date) rechaza el duplicado sin un SELECT previo
     new_log = HabitLog(habit_id=habit_id, **log.dict())
     db.add(new_log)
-    db.commit()
-    db.refresh(new_log)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Log already exists for this date")
+    
+    await db.run_sync(apply_log_change, habit, new_log.date, False, new_log.completed)
+    await db.commit()
+    await bump_versions(current_user.id, [habit_id])
+    await db.refresh(new_log)
+    if has_listeners(current_user.id):
+        await publish_log_changes(db, current_user.id, "logs.updated", [_log_event(new_log)], [habit])
     return new_log
 
+@router.post("/batch", response_model=HabitLogBatchResponse)
+async def apply_log_batch(
+    batch: HabitLogBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Aplicar muchas operaciones de logs (upsert o toggle) de varios hábitos en una sola transacción"""
+    if len(batch.operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {MAX_BATCH_OPERATIONS} operations")
+    
+    results = await db.run_sync(apply_log_operations, current_user.id, batch.operations)
+    await db.commit()
+    await bump_versions(current_user.id, {operation.habit_id for operation in batch.operations})
+    if has_listeners(current_user.id):
+        # Solo el estado final de cada día: la última operación sobre él
+        final = {(result["log"]["habit_id"], result["log"]["date"]): result["log"] for result in results if result.get("log") is not None}
+        await publish_log_changes(db, current_user.id, "logs.updated", [_log_event(log) for log in final.values()])
+    return {"results": results}
+
 @router.put("/{log_id}", response_model=HabitLogResponse)
-def update_habit_log(
+async def update_habit_log(
     log_id: int,
     log_update: HabitLogUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    log = db.query(HabitLog).join(Habit).filter(
+    row = (await db.execute(select(HabitLog, Habit).join(Habit).filter(
         HabitLog.id == log_id,
         Habit.user_id == current_user.id
-    ).first()
+    ).with_for_update().limit(1))).first()
     
-    if not log:
+    if not row:
         raise HTTPException(status_code=404, detail="Log not found")
+    log, habit = row
     
+    was_completed = log.completed
     update_data = log_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(log, key, value)
     
-    db.commit()
-    db.refresh(log)
+    await db.run_sync(apply_log_change, habit, log.date, was_completed, log.completed)
+    await db.commit()
+    await bump_versions(current_user.id, [habit.id])
+    await db.refresh(log)
+    if has_listeners(current_user.id):
+        await publish_log_changes(db, current_user.id, "logs.updated", [_log_event(log)], [habit])
     return log
 
 @router.delete("/{log_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_habit_log(
+async def delete_habit_log(
     log_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    log = db.query(HabitLog).join(Habit).filter(
+    row = (await db.execute(select(HabitLog, Habit).join(Habit).filter(
         HabitLog.id == log_id,
         Habit.user_id == current_user.id
-    ).first()
+    ).with_for_update().limit(1))).first()
     
-    if not log:
+    if not row:
         raise HTTPException(status_code=404, detail="Log not found")
+    log, habit = row
     
-    db.delete(log)
-    db.commit()
+    await db.delete(log)
+    await db.run_sync(apply_log_change, habit, log.date, log.completed, False)
+    await db.commit()
+    await bump_versions(current_user.id, [habit.id])
+    if has_listeners(current_user.id):
+        deleted = {"id": log.id, "habit_id": habit.id, "date": log.date.isoformat()}
+        await publish_log_changes(db, current_user.id, "logs.deleted", [deleted], [habit])
     return None
 
-@router.post("/habits/{habit_id}/toggle/{log_date}", response_model=HabitLogResponse)
-def toggle_habit_log(
+@router.post("/habits/{habit_id}/toggle/{log_date}", response_model=HabitLogResponse, dependencies=[Depends(query_budget(TOGGLE_QUERY_BUDGET))])
+async def toggle_habit_log(
     habit_id: int,
     log_date: date,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Toggle completion status for a specific date"""
-    # Verificar que el hábito pertenece al usuario
-    habit = db.query(Habit).filter(
+    # Verificar que el hábito pertenece al usuario (bloqueando su estado de rachas)
+    habit = await db.scalar(select(Habit).filter(
         Habit.id == habit_id,
         Habit.user_id == current_user.id
-    ).first()
+    ).with_for_update().limit(1))
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
     
-    # Buscar log existente
-    existing_log = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.date == log_date
-    ).first()
-    
-    if existing_log:
-        # Si existe, cambiar el estado
-        existing_log.completed = not existing_log.completed
-        db.commit()
-        db.refresh(existing_log)
-        return existing_log
+    # Insertar como completado o invertir el existente en una sola sentencia atómica
+    statement = upsert(
+        db, HabitLog, ["habit_id", "date"],
+        update_values={"completed": not_(HabitLog.completed)},
+        values={"habit_id": habit_id, "date": log_date, "completed": True}
+    )
+    if supports_returning(db):
+        log = (await db.scalars(statement.returning(HabitLog), execution_options={"populate_existing": True})).one()
     else:
-        # Si no existe, crear uno nuevo como completado
-        new_log = HabitLog(
-            habit_id=habit_id,
-            date=log_date,
-            completed=True
-        )
-        db.add(new_log)
-        db.commit()
-        db.refresh(new_log)
-        return new_log
\ No newline at end of file
+        await db.execute(statement)
+        log = (await db.scalars(select(HabitLog).filter(
+            HabitLog.habit_id == habit_id,
+            HabitLog.date == log_date
+        ).execution_options(populate_existing=True))).one()
+    
+    # Un toggle siempre invierte el estado (un día sin log equivale a no completado)
+    await db.run_sync(apply_log_change, habit, log_date, not log.completed, log.completed)
+    await db.commit()
+    await bump_versions(current_user.id, [habit_id])
+    await db.refresh(log)
+    if has_listeners(current_user.id):
+        await publish_log_changes(db, current_user.id, "logs.updated", [_log_event(log)], [habit])
+    return log
\ No newline at end of file
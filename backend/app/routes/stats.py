@@ -1,103 +1,207 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import date, timedelta
-from app.database.database import get_db
-from app.schemas.schemas import HabitStats, OverallStats
-from app.models.models import Habit, HabitLog, User
+from collections import Counter
+from app.database.database import get_read_db
+from app.schemas.schemas import (
+    HabitStats, OverallStats,
+    HabitWeeklyGoals, WeeklyGoalWeek, TrendGranularity, TrendPoint, TrendResponse
+)
+from app.models.models import Habit, HabitLog, HabitWeeklyRollup, User, UserDailyRollup
 from app.auth.auth import get_current_active_user
-from app.utils.helpers import calculate_streak, calculate_longest_streak, calculate_completion_rate
+from app.utils.helpers import calculate_completion_rate
+from app.utils.aggregates import completion_rates
+from app.utils.cache import cached, habit_version, user_version
+from app.utils.streaks import current_streak_for
+from app.utils.conditional import conditional_get
+from app.utils.query_stats import query_budget
+from app.utils.rollups import week_start
 
 router = APIRouter(prefix="/api/stats", tags=["Statistics"])
 
-@router.get("/habits/{habit_id}", response_model=HabitStats)
-def get_habit_stats(
+MAX_GOAL_WEEKS = 104
+MAX_TREND_DAYS = 3660
+
+# Solo las columnas que necesitan las estadísticas (sin description ni el resto de la entidad)
+STATS_COLUMNS = (
+    Habit.id, Habit.name, Habit.total_completions, Habit.current_streak, Habit.longest_streak, Habit.last_completed
+)
+
+def _habit_stats(habit, completion_rate: float) -> HabitStats:
+    """Estadísticas de un hábito: totales, rachas y último completado salen de su estado desnormalizado"""
+    return HabitStats(
+        habit_id=habit.id,
+        habit_name=habit.name,
+        total_logs=habit.total_completions,
+        current_streak=current_streak_for(habit),
+        longest_streak=habit.longest_streak,
+        completion_rate=completion_rate,
+        last_completed=habit.last_completed
+    )
+
+@router.get("/habits", response_model=List[HabitStats], dependencies=[Depends(query_budget(3)), Depends(conditional_get)])
+async def get_habits_stats(
+    ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Obtener estadísticas de varios hábitos (o de todos) con un número fijo de consultas"""
+    ids = sorted(set(ids)) if ids else None
+    key = f"{current_user.id}:{await user_version(current_user.id)}:{','.join(map(str, ids or []))}"
+    return await cached("stats.habits", key, lambda: _habits_stats(db, current_user.id, ids))
+
+async def _habits_stats(db: AsyncSession, user_id: int, ids: Optional[List[int]]) -> List[dict]:
+    query = select(*STATS_COLUMNS).filter(Habit.user_id == user_id)
+    if ids:
+        query = query.filter(Habit.id.in_(ids))
+    habits = (await db.execute(query.order_by(Habit.id))).all()
+    
+    if not habits:
+        return []
+    
+    # Tasas de cumplimiento de todos los hábitos pedidos en una consulta agrupada
+    rates = await db.run_sync(completion_rates, user_id, [habit.id for habit in habits] if ids else None)
+    
+    return [_habit_stats(habit, rates.get(habit.id, 0.0)).model_dump(mode="json") for habit in habits]
+
+@router.get("/habits/{habit_id}", response_model=HabitStats, dependencies=[Depends(query_budget(3)), Depends(conditional_get)])
+async def get_habit_stats(
     habit_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Obtener estadísticas de un hábito específico"""
-    habit = db.query(Habit).filter(
+    key = f"{current_user.id}:{habit_id}:{await habit_version(habit_id)}"
+    return await cached("stats.habit", key, lambda: _single_habit_stats(db, current_user.id, habit_id))
+
+async def _single_habit_stats(db: AsyncSession, user_id: int, habit_id: int) -> dict:
+    # La proyección hace también de comprobación de propiedad
+    habit = (await db.execute(select(*STATS_COLUMNS).filter(
         Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
+        Habit.user_id == user_id
+    ).limit(1))).first()
     
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
     
-    # Total de logs completados
-    total_logs = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.completed == True
-    ).count()
-    
-    # Calcular rachas
-    current_streak = calculate_streak(habit_id, db)
-    longest_streak = calculate_longest_streak(habit_id, db)
-    completion_rate = calculate_completion_rate(habit_id, db)
-    
-    # Último completado
-    last_log = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.completed == True
-    ).order_by(HabitLog.date.desc()).first()
-    
-    return HabitStats(
-        habit_id=habit.id,
-        habit_name=habit.name,
-        total_logs=total_logs,
-        current_streak=current_streak,
-        longest_streak=longest_streak,
-        completion_rate=completion_rate,
-        last_completed=last_log.date if last_log else None
-    )
+    completion_rate = await db.run_sync(lambda session: calculate_completion_rate(habit_id, session))
+    return _habit_stats(habit, completion_rate).model_dump(mode="json")
 
-@router.get("/overall", response_model=OverallStats)
-def get_overall_stats(
-    db: Session = Depends(get_db),
+@router.get("/overall", response_model=OverallStats, dependencies=[Depends(query_budget(3)), Depends(conditional_get)])
+async def get_overall_stats(
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Obtener estadísticas generales de todos los hábitos del usuario"""
-    # Total de hábitos
-    total_habits = db.query(Habit).filter(Habit.user_id == current_user.id).count()
-    
-    # Hábitos activos
-    active_habits = db.query(Habit).filter(
-        Habit.user_id == current_user.id,
-        Habit.is_active == True
-    ).count()
+    key = f"{current_user.id}:{await user_version(current_user.id)}"
+    return await cached("stats.overall", key, lambda: _overall_stats(db, current_user.id))
+
+async def _overall_stats(db: AsyncSession, user_id: int) -> dict:
+    # Conteos, completados y mejor racha desde el estado desnormalizado de los hábitos
+    total_habits, active_habits, total_completions, best_streak = (await db.execute(select(
+        func.count(Habit.id),
+        func.coalesce(func.sum(case((Habit.is_active == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(Habit.total_completions), 0),
+        func.coalesce(func.max(Habit.longest_streak), 0)
+    ).filter(Habit.user_id == user_id))).one()
     
-    # Obtener todos los hábitos del usuario
-    habits = db.query(Habit).filter(Habit.user_id == current_user.id).all()
+    # Tasas de cumplimiento de todos los hábitos en una consulta agrupada
+    rates = await db.run_sync(completion_rates, user_id)
     
-    total_completions = 0
     total_completion_rate = 0.0
-    best_streak = 0
+    for habit_id in sorted(rates):
+        total_completion_rate += rates[habit_id]
     
-    for habit in habits:
-        # Total de completados
-        completions = db.query(HabitLog).filter(
-            HabitLog.habit_id == habit.id,
-            HabitLog.completed == True
-        ).count()
-        total_completions += completions
-        
-        # Tasa de cumplimiento
-        rate = calculate_completion_rate(habit.id, db)
-        total_completion_rate += rate
-        
-        # Mejor racha
-        streak = calculate_longest_streak(habit.id, db)
-        if streak > best_streak:
-            best_streak = streak
-    
-    # Promedio de tasa de cumplimiento
-    avg_completion = total_completion_rate / len(habits) if habits else 0.0
+    # Promedio de tasa de cumplimiento (los hábitos sin logs cuentan como 0)
+    avg_completion = total_completion_rate / total_habits if total_habits else 0.0
     
     return OverallStats(
         total_habits=total_habits,
-        active_habits=active_habits,
-        total_completions=total_completions,
+        active_habits=int(active_habits),
+        total_completions=int(total_completions),
         average_completion_rate=round(avg_completion, 2),
-        best_streak=best_streak
-    )
\ No newline at end of file
+        best_streak=int(best_streak)
+    ).model_dump(mode="json")
+
+@router.get("/goals", response_model=List[HabitWeeklyGoals], dependencies=[Depends(query_budget(3)), Depends(conditional_get)])
+async def get_weekly_goals(
+    weeks: int = 4,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Cumplimiento del objetivo semanal (goal_frequency) de los hábitos activos en las últimas semanas"""
+    if not 1 <= weeks <= MAX_GOAL_WEEKS:
+        raise HTTPException(status_code=400, detail=f"weeks must be between 1 and {MAX_GOAL_WEEKS}")
+    key = f"{current_user.id}:{await user_version(current_user.id)}:{weeks}"
+    return await cached("stats.goals", key, lambda: _weekly_goals(db, current_user.id, weeks))
+
+async def _weekly_goals(db: AsyncSession, user_id: int, weeks: int) -> List[dict]:
+    # Semanas de lunes a domingo; la última es la semana en curso
+    first_week = week_start(date.today()) - timedelta(weeks=weeks - 1)
+    habits = (await db.execute(select(Habit.id, Habit.name, Habit.goal_frequency).filter(
+        Habit.user_id == user_id,
+        Habit.is_active == True
+    ).order_by(Habit.id))).all()
+    if not habits:
+        return []
+    
+    # Solo el acumulado semanal: nunca se leen los logs
+    counts = {
+        (habit_id, week): completions
+        for habit_id, week, completions in (await db.execute(select(
+            HabitWeeklyRollup.habit_id, HabitWeeklyRollup.week_start, HabitWeeklyRollup.completions
+        ).filter(
+            HabitWeeklyRollup.habit_id.in_([habit.id for habit in habits]),
+            HabitWeeklyRollup.week_start >= first_week
+        ))).all()
+    }
+    
+    result = []
+    for habit in habits:
+        goal = habit.goal_frequency or 7
+        history = []
+        for offset in range(weeks):
+            week = first_week + timedelta(weeks=offset)
+            completions = counts.get((habit.id, week), 0)
+            history.append(WeeklyGoalWeek(week_start=week, completions=completions, goal_met=completions >= goal))
+        result.append(HabitWeeklyGoals(
+            habit_id=habit.id, habit_name=habit.name, goal_frequency=goal, weeks=history
+        ).model_dump(mode="json"))
+    return result
+
+@router.get("/trend", response_model=TrendResponse, dependencies=[Depends(query_budget(2)), Depends(conditional_get)])
+async def get_trend(
+    days: int = 90,
+    granularity: TrendGranularity = TrendGranularity.day,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Serie de completados del usuario por día o por semana en los últimos ``days`` días"""
+    if not 1 <= days <= MAX_TREND_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {MAX_TREND_DAYS}")
+    key = f"{current_user.id}:{await user_version(current_user.id)}:{days}:{granularity.value}"
+    return await cached("stats.trend", key, lambda: _trend(db, current_user.id, days, granularity))
+
+async def _trend(db: AsyncSession, user_id: int, days: int, granularity: TrendGranularity) -> dict:
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+    # Solo el acumulado diario del usuario: como mucho una fila por día del rango
+    rows = (await db.execute(select(UserDailyRollup.date, UserDailyRollup.completions).filter(
+        UserDailyRollup.user_id == user_id,
+        UserDailyRollup.date.between(start, end)
+    ))).all()
+    
+    weekly = granularity == TrendGranularity.week
+    counts = Counter()
+    for day, completions in rows:
+        counts[week_start(day) if weekly else day] += completions
+    
+    step = timedelta(weeks=1) if weekly else timedelta(days=1)
+    point = week_start(start) if weekly else start
+    points = []
+    while point <= end:
+        points.append(TrendPoint(date=point, completions=counts.get(point, 0)))
+        point += step
+    return TrendResponse(start=start, end=end, granularity=granularity, points=points).model_dump(mode="json")
\ No newline at end of file
@@ -2,6 +2,7 @@ from pydantic import BaseModel, EmailStr
 from datetime import datetime, date
 from typing import Optional, List
 from enum import Enum
+from app.utils.profiler import ProfilerMode
 
 # Enums
 class CategoryEnum(str, Enum):
@@ -58,6 +59,10 @@ class HabitResponse(HabitBase):
     class Config:
         from_attributes = True
 
+class HabitPage(BaseModel):
+    items: List[HabitResponse]
+    next_cursor: Optional[str] = None
+
 # HabitLog Schemas
 class HabitLogBase(BaseModel):
     habit_id: int
@@ -81,6 +86,65 @@ class HabitLogResponse(HabitLogBase):
     class Config:
         from_attributes = True
 
+class HabitLogPage(BaseModel):
+    items: List[HabitLogResponse]
+    next_cursor: Optional[str] = None
+
+class LogOperationAction(str, Enum):
+    upsert = "upsert"
+    toggle = "toggle"
+
+class HabitLogOperation(BaseModel):
+    habit_id: int
+    date: date
+    action: LogOperationAction = LogOperationAction.upsert
+    completed: bool = True
+    notes: Optional[str] = None
+
+class HabitLogBatchRequest(BaseModel):
+    operations: List[HabitLogOperation]
+
+class HabitLogOperationResult(BaseModel):
+    index: int
+    status: str
+    log: Optional[HabitLogResponse] = None
+    detail: Optional[str] = None
+
+class HabitLogBatchResponse(BaseModel):
+    results: List[HabitLogOperationResult]
+
+class HeatmapEncoding(str, Enum):
+    bits = "bits"
+    rle = "rle"
+
+class HabitHeatmap(BaseModel):
+    habit_id: int
+    days: Optional[str] = None
+    runs: Optional[List[int]] = None
+
+class HeatmapResponse(BaseModel):
+    start: date
+    end: date
+    encoding: HeatmapEncoding
+    habits: List[HabitHeatmap]
+
+# Export Schemas
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+class ImportRowError(BaseModel):
+    row: int
+    detail: str
+
+class ImportResult(BaseModel):
+    processed: int
+    created: int
+    updated: int
+    skipped: int
+    error_count: int
+    errors: List[ImportRowError]
+
 # Stats Schemas
 class HabitStats(BaseModel):
     habit_id: int
@@ -98,14 +162,60 @@ class OverallStats(BaseModel):
     average_completion_rate: float
     best_streak: int
 
+class WeeklyGoalWeek(BaseModel):
+    week_start: date
+    completions: int
+    goal_met: bool
+
+class HabitWeeklyGoals(BaseModel):
+    habit_id: int
+    habit_name: str
+    goal_frequency: int
+    weeks: List[WeeklyGoalWeek]
+
+class TrendGranularity(str, Enum):
+    day = "day"
+    week = "week"
+
+class TrendPoint(BaseModel):
+    date: date
+    completions: int
+
+class TrendResponse(BaseModel):
+    start: date
+    end: date
+    granularity: TrendGranularity
+    points: List[TrendPoint]
+
 # Auth Schemas
 class Token(BaseModel):
     access_token: str
     token_type: str
 
+class EventsTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
 class LoginRequest(BaseModel):
     username: str
-    password: str
\ No newline at end of file
+    password: str
+
+class ProfilerStart(BaseModel):
+    mode: ProfilerMode = ProfilerMode.sample
+    route: Optional[str] = None
+    duration_seconds: float = 30
+    sample_rate: float = 1.0
+    interval_ms: float = 5
+    max_requests: Optional[int] = None
+
+class ProfilerStatus(BaseModel):
+    active: bool
+    mode: ProfilerMode
+    route: Optional[str] = None
+    started_at: datetime
+    remaining_seconds: float
+    requests_profiled: int
+    samples: int
\ No newline at end of file
@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import Date, case, func, literal
+from sqlalchemy.orm import Session
+from app.models.models import Habit, HabitLog
+from app.utils.helpers import (
+    completion_rate_from_count,
+    longest_streak_from_dates,
+    trailing_streak_from_dates,
+)
+
+# Dialectos con funciones de ventana y aritmética de fechas que sabemos traducir
+WINDOW_DIALECTS = ("mysql", "mariadb", "postgresql")
+
+EPOCH = date(1970, 1, 1)
+
+def _completed_logs(query, user_id: Optional[int] = None, habit_ids: Optional[Iterable[int]] = None):
+    """Restringir una consulta a los logs completados (de un usuario y/o de ciertos hábitos)"""
+    query = query.filter(HabitLog.completed == True)
+    if user_id is not None:
+        query = query.join(Habit, Habit.id == HabitLog.habit_id).filter(Habit.user_id == user_id)
+    if habit_ids is not None:
+        query = query.filter(HabitLog.habit_id.in_(list(habit_ids)))
+    return query
+
+def count_completions(
+    db: Session, user_id: Optional[int], habit_ids: Optional[Iterable[int]] = None
+) -> Dict[int, Tuple[int, Optional[date]]]:
+    """Total de completados y última fecha completada por hábito, en una sola consulta"""
+    rows = _completed_logs(
+        db.query(HabitLog.habit_id, func.count(HabitLog.id), func.max(HabitLog.date)),
+        user_id, habit_ids
+    ).group_by(HabitLog.habit_id).all()
+    return {habit_id: (total, last) for habit_id, total, last in rows}
+
+def completion_rates(
+    db: Session, user_id: Optional[int], habit_ids: Optional[Iterable[int]] = None, days: int = 30
+) -> Dict[int, float]:
+    """Tasa de cumplimiento de los últimos N días por hábito, en una sola consulta"""
+    start_date = date.today() - timedelta(days=days)
+    rows = _completed_logs(
+        db.query(HabitLog.habit_id, func.count(HabitLog.id)),
+        user_id, habit_ids
+    ).filter(HabitLog.date >= start_date).group_by(HabitLog.habit_id).all()
+    return {habit_id: completion_rate_from_count(count, days) for habit_id, count in rows}
+
+def _day_number(dialect: str):
+    """Expresión que convierte la fecha del log en un número de día entero"""
+    if dialect in ("mysql", "mariadb"):
+        return func.to_days(HabitLog.date)
+    return HabitLog.date - literal(EPOCH, Date)
+
+def _window_streak_runs(db: Session, user_id, habit_ids, dialect: str):
+    """Rachas por hábito con la técnica gaps-and-islands en SQL"""
+    # Fechas consecutivas comparten el mismo valor de (día - rango)
+    days = _completed_logs(
+        db.query(
+            HabitLog.habit_id.label("habit_id"),
+            HabitLog.date.label("day"),
+            (
+                _day_number(dialect)
+                - func.dense_rank().over(partition_by=HabitLog.habit_id, order_by=HabitLog.date)
+            ).label("island"),
+        ),
+        user_id, habit_ids
+    ).subquery()
+
+    # Cada isla conoce además la última fecha completada de su hábito
+    islands = db.query(
+        days.c.habit_id.label("habit_id"),
+        func.count(func.distinct(days.c.day)).label("length"),
+        func.max(days.c.day).label("last_day"),
+        func.max(func.max(days.c.day)).over(partition_by=days.c.habit_id).label("habit_last_day"),
+    ).group_by(days.c.habit_id, days.c.island).subquery()
+
+    # La racha final es la isla que termina en la última fecha completada
+    rows = db.query(
+        islands.c.habit_id,
+        func.max(islands.c.habit_last_day),
+        func.max(case((islands.c.last_day == islands.c.habit_last_day, islands.c.length), else_=0)),
+        func.max(islands.c.length),
+    ).group_by(islands.c.habit_id).all()
+
+    return {habit_id: (last_day, trailing, longest) for habit_id, last_day, trailing, longest in rows}
+
+def _python_streak_runs(db: Session, user_id, habit_ids):
+    """Rachas por hábito calculadas en Python a partir de una sola consulta de fechas"""
+    rows = _completed_logs(
+        db.query(HabitLog.habit_id, HabitLog.date),
+        user_id, habit_ids
+    ).order_by(HabitLog.habit_id, HabitLog.date).all()
+
+    runs = {}
+    for habit_id, group in groupby(rows, key=lambda row: row[0]):
+        dates = [row[1] for row in group]
+        runs[habit_id] = (dates[-1], trailing_streak_from_dates(dates), longest_streak_from_dates(dates))
+    return runs
+
+def streak_runs(
+    db: Session, user_id: Optional[int], habit_ids: Optional[Iterable[int]] = None
+) -> Dict[int, Tuple[date, int, int]]:
+    """Última fecha completada, racha final y racha más larga por hábito
+
+    Usa un número constante de consultas sin importar cuántos hábitos se pidan.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in WINDOW_DIALECTS:
+        return _window_streak_runs(db, user_id, habit_ids, dialect)
+    return _python_streak_runs(db, user_id, habit_ids)
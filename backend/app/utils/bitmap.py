@@ -0,0 +1,188 @@
+from datetime import date
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.models import Habit, HabitCompletionBitmap, HabitLog
+
+# Un bit por día del año (366 días caben en 46 bytes), bit 0 = 1 de enero
+YEAR_BYTES = 46
+
+def _day_of_year(day: date) -> int:
+    return day.timetuple().tm_yday - 1
+
+def set_day_bit(bits: Optional[bytes], day: date, completed: bool) -> bytes:
+    """Devolver una copia del bitmap anual con el día marcado o desmarcado"""
+    data = bytearray(bits or bytes(YEAR_BYTES))
+    index = _day_of_year(day)
+    if completed:
+        data[index >> 3] |= 1 << (index & 7)
+    else:
+        data[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+    return bytes(data)
+
+def pack_year(days: Iterable[date]) -> bytes:
+    """Empaquetar los días completados de un mismo año en su bitmap"""
+    data = bytearray(YEAR_BYTES)
+    for day in days:
+        index = _day_of_year(day)
+        data[index >> 3] |= 1 << (index & 7)
+    return bytes(data)
+
+class CompletionHistory:
+    """Historial de días completados de un hábito como un único entero de bits
+
+    El bit k corresponde al día ``origin + k`` (ordinal), así que rachas y
+    conteos se resuelven con operaciones de bits sobre unos cientos de bytes.
+    """
+
+    def __init__(self, bitmaps: Dict[int, bytes]):
+        self.origin = date(min(bitmaps), 1, 1).toordinal() if bitmaps else 0
+        self.value = 0
+        for year, bits in bitmaps.items():
+            offset = date(year, 1, 1).toordinal() - self.origin
+            self.value |= int.from_bytes(bits, "little") << offset
+
+    def is_completed(self, day: date) -> bool:
+        offset = day.toordinal() - self.origin
+        return offset >= 0 and bool(self.value >> offset & 1)
+
+    def total(self) -> int:
+        """Número de días completados"""
+        return self.value.bit_count()
+
+    def count_since(self, start: date) -> int:
+        """Número de días completados desde ``start`` (incluido) en adelante"""
+        offset = start.toordinal() - self.origin
+        if offset <= 0:
+            return self.total()
+        return (self.value >> offset).bit_count()
+
+    def last_completed(self) -> Optional[date]:
+        """Último día completado"""
+        if not self.value:
+            return None
+        return date.fromordinal(self.origin + self.value.bit_length() - 1)
+
+    def trailing_streak(self) -> int:
+        """Longitud de la racha que termina en el último día completado"""
+        if not self.value:
+            return 0
+        last = self.value.bit_length() - 1
+        # El cero más alto por debajo del último bit marca el inicio de la racha
+        gaps = ~self.value & ((1 << last) - 1)
+        return last - gaps.bit_length() + 1
+
+    def longest_streak(self) -> int:
+        """Longitud de la racha más larga"""
+        if not self.value:
+            return 0
+        return max(len(run) for run in bin(self.value)[2:].split("0"))
+
+    def days(self, start: date, end: date) -> str:
+        """Cadena '0'/'1' con un carácter por día entre ``start`` y ``end`` (incluidos)"""
+        length = end.toordinal() - start.toordinal() + 1
+        if length <= 0:
+            return ""
+        offset = start.toordinal() - self.origin
+        window = self.value >> offset if offset >= 0 else self.value << -offset
+        window &= (1 << length) - 1
+        # format() escribe primero el bit más alto; invertimos para que el día más antiguo vaya primero
+        return format(window, f"0{length}b")[::-1]
+
+    def runs(self, start: date, end: date) -> List[int]:
+        """Codificación run-length del rango: longitudes alternas empezando por días sin completar"""
+        lengths = [len(list(group)) for _, group in groupby(self.days(start, end))]
+        if lengths and self.is_completed(start):
+            lengths.insert(0, 0)
+        return lengths
+
+def load_history(db: Session, habit_id: int, since: Optional[date] = None) -> CompletionHistory:
+    """Cargar el historial de un hábito (opcionalmente solo desde cierto año)"""
+    query = db.query(HabitCompletionBitmap.year, HabitCompletionBitmap.bits).filter(
+        HabitCompletionBitmap.habit_id == habit_id
+    )
+    if since is not None:
+        query = query.filter(HabitCompletionBitmap.year >= since.year)
+    return CompletionHistory({year: bits for year, bits in query.all()})
+
+def mark_day(db: Session, habit_id: int, day: date, completed: bool) -> None:
+    """Actualizar el bit de un día en el bitmap anual del hábito"""
+    bitmap = db.query(HabitCompletionBitmap).filter(
+        HabitCompletionBitmap.habit_id == habit_id,
+        HabitCompletionBitmap.year == day.year
+    ).first()
+    if bitmap is None:
+        if not completed:
+            return
+        bitmap = HabitCompletionBitmap(habit_id=habit_id, year=day.year)
+        db.add(bitmap)
+    bitmap.bits = set_day_bit(bitmap.bits, day, completed)
+
+def mark_days(db: Session, changes: Iterable[Tuple[int, date, bool]]) -> Dict[int, CompletionHistory]:
+    """Aplicar varios cambios (habit_id, día, completado) con una sola lectura de bitmaps
+
+    Devuelve el historial actualizado de cada hábito afectado.
+    """
+    changes = list(changes)
+    habit_ids = {habit_id for habit_id, _, _ in changes}
+    if not habit_ids:
+        return {}
+
+    bitmaps = {
+        (bitmap.habit_id, bitmap.year): bitmap
+        for bitmap in db.query(HabitCompletionBitmap).filter(
+            HabitCompletionBitmap.habit_id.in_(habit_ids)
+        ).all()
+    }
+    for habit_id, day, completed in changes:
+        bitmap = bitmaps.get((habit_id, day.year))
+        if bitmap is None:
+            if not completed:
+                continue
+            bitmap = HabitCompletionBitmap(habit_id=habit_id, year=day.year)
+            db.add(bitmap)
+            bitmaps[(habit_id, day.year)] = bitmap
+        bitmap.bits = set_day_bit(bitmap.bits, day, completed)
+
+    histories = {habit_id: {} for habit_id in habit_ids}
+    for (habit_id, year), bitmap in bitmaps.items():
+        histories[habit_id][year] = bitmap.bits
+    return {habit_id: CompletionHistory(years) for habit_id, years in histories.items()}
+
+def rebuild_bitmaps(db: Session, batch_size: int = 500, user_id: Optional[int] = None) -> int:
+    """Reconstruir los bitmaps de los hábitos existentes a partir de habit_logs, por lotes
+
+    Devuelve el número de hábitos procesados.
+    """
+    query = db.query(Habit.id).order_by(Habit.id)
+    if user_id is not None:
+        query = query.filter(Habit.user_id == user_id)
+
+    processed = 0
+    last_id = 0
+    while True:
+        habit_ids = [row.id for row in query.filter(Habit.id > last_id).limit(batch_size).all()]
+        if not habit_ids:
+            break
+
+        rows = db.query(HabitLog.habit_id, HabitLog.date).filter(
+            HabitLog.habit_id.in_(habit_ids),
+            HabitLog.completed == True
+        ).order_by(HabitLog.habit_id, HabitLog.date).all()
+
+        db.query(HabitCompletionBitmap).filter(
+            HabitCompletionBitmap.habit_id.in_(habit_ids)
+        ).delete(synchronize_session=False)
+
+        bitmaps = [
+            {"habit_id": habit_id, "year": year, "bits": pack_year(row.date for row in year_rows)}
+            for (habit_id, year), year_rows in groupby(rows, key=lambda row: (row.habit_id, row.date.year))
+        ]
+        if bitmaps:
+            db.execute(insert(HabitCompletionBitmap), bitmaps)
+        db.commit()
+
+        processed += len(habit_ids)
+        last_id = habit_ids[-1]
+    return processed
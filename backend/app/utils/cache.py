@@ -0,0 +1,127 @@
+"""Caché de respuestas con invalidación por versión
+
+Las claves incluyen un contador de versión por usuario (y por hábito) que las
+rutas de escritura incrementan tras confirmar; las entradas viejas dejan de
+leerse y caen por LRU/TTL. El backend es intercambiable: cualquier almacén
+compartido que implemente CacheBackend sirve para varios workers.
+"""
+from collections import OrderedDict
+from datetime import date
+from threading import Lock
+from typing import Awaitable, Callable, Iterable, Optional
+import os
+import time
+from app.utils.metrics import Callback, Counter
+
+STATS_CACHE_ENABLED = os.getenv("STATS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+STATS_CACHE_TTL_SECONDS = float(os.getenv("STATS_CACHE_TTL_SECONDS", "300"))
+STATS_CACHE_SIZE = int(os.getenv("STATS_CACHE_SIZE", "10000"))
+
+CACHE_REQUESTS = Counter("response_cache_requests_total", "Response cache lookups", labelnames=("name", "result"))
+
+class CacheBackend:
+    """Interfaz mínima de un almacén clave-valor con TTL y contadores atómicos"""
+
+    async def get(self, key: str):
+        raise NotImplementedError
+
+    async def set(self, key: str, value, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    async def incr(self, key: str, initial: int) -> int:
+        """Incrementar un contador; si no existe se crea con ``initial``"""
+        raise NotImplementedError
+
+class MemoryCache(CacheBackend):
+    """Backend en proceso: LRU acotado con TTL por entrada"""
+
+    def __init__(self, maxsize: int = STATS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def _get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value, ttl: Optional[float]) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str):
+        with self._lock:
+            return self._get(key)
+
+    async def set(self, key: str, value, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._set(key, value, ttl)
+
+    async def incr(self, key: str, initial: int) -> int:
+        with self._lock:
+            value = self._get(key)
+            value = initial if value is None else value + 1
+            self._set(key, value, None)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+cache_backend: CacheBackend = MemoryCache()
+
+# Solo el backend en proceso sabe cuántas entradas tiene
+Callback("response_cache_entries", "Entries in the in-process response cache", lambda: len(cache_backend) if isinstance(cache_backend, MemoryCache) else 0)
+
+def set_cache_backend(backend: CacheBackend) -> None:
+    """Sustituir el backend (p. ej. por uno compartido entre workers)"""
+    global cache_backend
+    cache_backend = backend
+
+async def _version(scope: str) -> int:
+    # Un contador perdido (expulsado por LRU o reinicio) renace con time_ns, nunca con un valor ya usado
+    version = await cache_backend.get(f"version:{scope}")
+    if version is None:
+        version = await cache_backend.incr(f"version:{scope}", time.time_ns())
+    return version
+
+async def user_version(user_id: int) -> int:
+    return await _version(f"user:{user_id}")
+
+async def habit_version(habit_id: int) -> int:
+    return await _version(f"habit:{habit_id}")
+
+async def bump_versions(user_id: int, habit_ids: Iterable[int] = ()) -> None:
+    """Invalidar las respuestas cacheadas del usuario y de los hábitos tocados"""
+    await cache_backend.incr(f"version:user:{user_id}", time.time_ns())
+    for habit_id in set(habit_ids):
+        await cache_backend.incr(f"version:habit:{habit_id}", time.time_ns())
+
+async def cached(name: str, key: str, compute: Callable[[], Awaitable[object]], ttl: float = STATS_CACHE_TTL_SECONDS):
+    """Devolver el valor cacheado o calcularlo y guardarlo
+
+    ``key`` debe incluir las versiones de las que depende el valor; se le añade
+    la fecha actual porque rachas y tasas cambian al cambiar el día.
+    """
+    if not STATS_CACHE_ENABLED:
+        return await compute()
+    full_key = f"{name}:{key}:{date.today().isoformat()}"
+    value = await cache_backend.get(full_key)
+    if value is not None:
+        CACHE_REQUESTS.inc(name=name, result="hit")
+        return value
+    CACHE_REQUESTS.inc(name=name, result="miss")
+    value = await compute()
+    await cache_backend.set(full_key, value, ttl)
+    return value
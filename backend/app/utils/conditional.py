@@ -0,0 +1,53 @@
+"""GET condicionales: ETag débil a partir de la versión de datos del usuario"""
+from datetime import date
+from hashlib import blake2b
+import os
+import time
+from fastapi import Depends, HTTPException, Request, Response
+from app.auth.auth import get_current_active_user
+from app.auth.user_cache import AuthenticatedUser
+from app.utils.cache import user_version
+from app.utils.metrics import Counter
+
+# Con el backend en proceso y varios workers las versiones no se comparten:
+# rotar el ETag acota cuánto puede durar un 304 obsoleto
+ETAG_ROTATE_SECONDS = int(os.getenv("ETAG_ROTATE_SECONDS", "300"))
+
+CONDITIONAL_REQUESTS = Counter("conditional_get_requests_total", "GETs answered with ETag", labelnames=("result",))
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (lista de ETags o *)"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+async def user_etag(request: Request, user_id: int) -> str:
+    """ETag de la respuesta: versión de datos del usuario, día actual y la URL pedida"""
+    version = await user_version(user_id)
+    bucket = int(time.time() // ETAG_ROTATE_SECONDS) if ETAG_ROTATE_SECONDS > 0 else 0
+    url = request.url.path + "?" + request.url.query
+    digest = blake2b(f"{user_id}:{version}:{date.today()}:{bucket}:{url}".encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    current_user: AuthenticatedUser = Depends(get_current_active_user)
+) -> None:
+    """Responder 304 antes de consultar nada si el cliente ya tiene la versión actual"""
+    etag = await user_etag(request, current_user.id)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        CONDITIONAL_REQUESTS.inc(result="not_modified")
+        raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    CONDITIONAL_REQUESTS.inc(result="full")
+    response.headers["ETag"] = etag
+    # Que el navegador revalide siempre en lugar de reutilizar la respuesta a ciegas
+    response.headers["Cache-Control"] = "private, no-cache"
@@ -0,0 +1,174 @@
+"""Bus de eventos para el stream SSE de cambios de cada usuario
+
+Las rutas de escritura publican, tras confirmar, un delta compacto en el canal
+del usuario; cada conexión de GET /api/events es un suscriptor con su cola.
+Si nadie escucha no se construye ni se serializa nada. El backend por defecto
+reparte en proceso; con varios workers se sustituye (set_event_backend) por
+uno compartido que implemente EventBackend.
+"""
+from typing import Dict, Iterable, List, Optional, Set
+import asyncio
+import os
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Habit
+from app.utils.aggregates import completion_rates
+from app.utils.fast_json import dumps
+from app.utils.metrics import Counter, Gauge
+from app.utils.streaks import current_streak_for
+
+# Mensajes pendientes por conexión; si se llena, el cliente recibe un resync
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+# Las conexiones se cierran pasado este tiempo y el navegador reconecta solo
+# (reparte las conexiones entre workers y no bloquea un apagado ordenado)
+EVENTS_MAX_STREAM_SECONDS = float(os.getenv("EVENTS_MAX_STREAM_SECONDS", "300"))
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "3000"))
+# Con más logs cambiados que esto se envía un resync en lugar del delta
+EVENTS_MAX_DELTA_LOGS = int(os.getenv("EVENTS_MAX_DELTA_LOGS", "100"))
+
+# Estado del hábito que acompaña a los deltas de logs
+DELTA_COLUMNS = (Habit.id, Habit.total_completions, Habit.current_streak, Habit.longest_streak, Habit.last_completed)
+
+EVENTS_PUBLISHED = Counter("events_published_total", "Events published to live update streams", labelnames=("type",))
+EVENTS_DROPPED = Counter("events_dropped_total", "Events dropped because a stream's queue was full")
+EVENT_STREAMS = Gauge("event_streams_open", "Open live update (SSE) connections")
+
+def format_event(event_type: str, data) -> str:
+    """Mensaje SSE: tipo y una línea de datos JSON"""
+    return f"event: {event_type}\ndata: {dumps(data).decode()}\n\n"
+
+RESYNC_EVENT = format_event("resync", {})
+
+class Subscription:
+    """Cola de mensajes de una conexión; si se desborda se sustituye por un único resync"""
+
+    def __init__(self, channel: str, maxsize: int = EVENTS_QUEUE_SIZE):
+        self.channel = channel
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize)
+        self.lagged = False
+
+    def put(self, message: str) -> None:
+        """Encolar un mensaje (desde el event loop)"""
+        if self.lagged:
+            EVENTS_DROPPED.inc()
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # El cliente va retrasado: mejor que recargue que recibir deltas incompletos
+            self.lagged = True
+            EVENTS_DROPPED.inc()
+
+    async def get(self, timeout: float) -> Optional[str]:
+        """Siguiente mensaje, o None si no llega ninguno en ``timeout`` segundos"""
+        if self.lagged and self.queue.empty():
+            self.lagged = False
+            return RESYNC_EVENT
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class EventBackend:
+    """Interfaz mínima del bus: publicar en un canal y suscribirse a él"""
+
+    def has_subscribers(self, channel: str) -> bool:
+        """Un backend compartido no sabe si hay oyentes en otros workers: asume que sí"""
+        return True
+
+    async def publish(self, channel: str, message: str) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str) -> Subscription:
+        raise NotImplementedError
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        raise NotImplementedError
+
+class MemoryEventBackend(EventBackend):
+    """Reparto en proceso: solo llega a las conexiones abiertas en el mismo worker"""
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+
+    def has_subscribers(self, channel: str) -> bool:
+        return channel in self._subscriptions
+
+    async def publish(self, channel: str, message: str) -> None:
+        for subscription in self._subscriptions.get(channel, ()):
+            subscription.put(message)
+
+    async def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(channel)
+        self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.channel)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.channel]
+
+event_backend: EventBackend = MemoryEventBackend()
+
+def set_event_backend(backend: EventBackend) -> None:
+    """Sustituir el backend (p. ej. por uno compartido entre workers)"""
+    global event_backend
+    event_backend = backend
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def has_listeners(user_id: int) -> bool:
+    """Hay (o puede haber) conexiones del usuario: si no, no merece la pena preparar el delta"""
+    return event_backend.has_subscribers(user_channel(user_id))
+
+async def subscribe(user_id: int) -> Subscription:
+    return await event_backend.subscribe(user_channel(user_id))
+
+async def unsubscribe(subscription: Subscription) -> None:
+    await event_backend.unsubscribe(subscription)
+
+async def publish(user_id: int, event_type: str, data) -> None:
+    """Enviar un evento a las conexiones del usuario; llamar después del commit"""
+    channel = user_channel(user_id)
+    if not event_backend.has_subscribers(channel):
+        return
+    await event_backend.publish(channel, format_event(event_type, data))
+    EVENTS_PUBLISHED.inc(type=event_type)
+
+def habit_delta(habit, completion_rate: float) -> dict:
+    """Rachas y tasa actuales de un hábito (los campos de HabitStats que cambia un log)"""
+    return {
+        "habit_id": habit.id,
+        "total_logs": habit.total_completions,
+        "current_streak": current_streak_for(habit),
+        "longest_streak": habit.longest_streak,
+        "completion_rate": completion_rate,
+        "last_completed": habit.last_completed,
+    }
+
+async def publish_log_changes(
+    db: AsyncSession, user_id: int, event_type: str, logs: List[dict], habits: Optional[Iterable] = None
+) -> None:
+    """Publicar logs cambiados junto con el nuevo estado de sus hábitos
+
+    ``habits`` evita releer los hábitos cuando la ruta ya los tiene cargados;
+    la tasa de cumplimiento sale de una consulta agrupada. Solo se consulta
+    algo si el usuario tiene conexiones abiertas.
+    """
+    if not logs or not has_listeners(user_id):
+        return
+    if len(logs) > EVENTS_MAX_DELTA_LOGS:
+        await publish(user_id, "resync", {})
+        return
+    habit_ids = sorted({log["habit_id"] for log in logs})
+    if habits is None:
+        habits = (await db.execute(select(*DELTA_COLUMNS).filter(Habit.id.in_(habit_ids), Habit.user_id == user_id))).all()
+    rates = await db.run_sync(completion_rates, user_id, habit_ids)
+    await publish(user_id, event_type, {
+        "logs": logs,
+        "habits": [habit_delta(habit, rates.get(habit.id, 0.0)) for habit in habits],
+    })
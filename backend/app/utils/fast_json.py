@@ -0,0 +1,89 @@
+"""Respuestas rápidas para listados: columnas como tuplas y serialización directa a JSON
+
+Con FAST_LIST_RESPONSES los listados seleccionan solo las columnas del esquema
+de respuesta y devuelven los bytes ya serializados, sin construir ni validar un
+modelo Pydantic por fila. El ``response_model`` de la ruta no cambia, así que el
+esquema OpenAPI es el mismo; solo se salta la validación de la salida.
+
+Con ``fields=`` (sparse fieldsets) se usa siempre este camino y solo se leen y
+devuelven las columnas pedidas (más ``id``).
+"""
+from typing import Any, Iterable, List, Mapping, Optional
+import os
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+FAST_LIST_RESPONSES = os.getenv("FAST_LIST_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+# Serializador precompilado de pydantic-core para valores ya correctos (no valida)
+_ANY = TypeAdapter(Any)
+
+def dumps(content) -> bytes:
+    """JSON compacto con fechas en ISO 8601 y enums por valor, como la salida de Pydantic"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return _ANY.dump_json(content)
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def sparse_fields(fields: Optional[str], schema: type[BaseModel]) -> Optional[List[str]]:
+    """Campos pedidos en ``fields=a,b`` en el orden del esquema, con ``id`` siempre; 400 si no existen"""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add("id")
+    return [name for name in schema.model_fields if name in requested]
+
+def _projected(fields: Optional[List[str]]) -> bool:
+    return FAST_LIST_RESPONSES or fields is not None
+
+def list_select(model, schema: type[BaseModel], fields: Optional[List[str]] = None, extra: Iterable[str] = ()) -> Select:
+    """SELECT de la entidad completa o, en modo rápido o con ``fields``, solo de esas columnas
+
+    ``extra`` son columnas que la consulta necesita leer aunque no se devuelvan
+    (p. ej. la clave del cursor).
+    """
+    if not _projected(fields):
+        return select(model)
+    names = list(fields or schema.model_fields)
+    names += [name for name in extra if name not in names]
+    return select(*(getattr(model, name) for name in names))
+
+async def fetch_all(db: AsyncSession, query: Select, fields: Optional[List[str]] = None) -> List:
+    """Objetos ORM o, si la consulta es proyectada, filas (tuplas con nombre) de list_select"""
+    if _projected(fields):
+        return (await db.execute(query)).all()
+    return (await db.scalars(query)).all()
+
+def _rows(rows, fields: Optional[List[str]]) -> List[dict]:
+    if fields is None:
+        return [row._asdict() for row in rows]
+    return [{name: getattr(row, name) for name in fields} for row in rows]
+
+def list_response(content, response: Optional[Response] = None, fields: Optional[List[str]] = None):
+    """Devolver el listado tal cual o, si es proyectado, ya serializado
+
+    ``content`` es una lista de filas o una página ``{items, next_cursor}``. Las
+    cabeceras ya puestas en ``response`` (ETag, Cache-Control) se conservan.
+    """
+    if not _projected(fields):
+        return content
+    if isinstance(content, Mapping):
+        content = {**content, "items": _rows(content["items"], fields)}
+    else:
+        content = _rows(content, fields)
+    return FastJSONResponse(content, headers=response.headers if response is not None else None)
@@ -1,50 +1,52 @@
 from datetime import date, timedelta
-from typing import List
+from typing import List, Optional
 from sqlalchemy.orm import Session
-from app.models.models import HabitLog
+from app.utils.bitmap import load_history
 
-def calculate_streak(habit_id: int, db: Session) -> int:
-    """Calcular la racha actual de un hábito"""
-    logs = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.completed == True
-    ).order_by(HabitLog.date.desc()).all()
-    
-    if not logs:
+def trailing_streak_from_dates(dates: List[date]) -> int:
+    """Longitud de la racha que termina en la última fecha completada (fechas en orden ascendente)"""
+    if not dates:
         return 0
     
-    streak = 0
+    streak = 1
+    expected_date = dates[-1] - timedelta(days=1)
+    
+    for i in range(len(dates) - 2, -1, -1):
+        if dates[i] == expected_date:
+            streak += 1
+            expected_date -= timedelta(days=1)
+        else:
+            break
+    
+    return streak
+
+def current_streak_from_state(last_completed: Optional[date], trailing_streak: int) -> int:
+    """Racha actual: la racha final solo cuenta si se completó hoy o ayer"""
     current_date = date.today()
     
     # Verificar si completó hoy o ayer
-    if logs[0].date == current_date or logs[0].date == current_date - timedelta(days=1):
-        streak = 1
-        expected_date = logs[0].date - timedelta(days=1)
-        
-        for i in range(1, len(logs)):
-            if logs[i].date == expected_date:
-                streak += 1
-                expected_date -= timedelta(days=1)
-            else:
-                break
+    if last_completed == current_date or last_completed == current_date - timedelta(days=1):
+        return trailing_streak
     
-    return streak
+    return 0
 
-def calculate_longest_streak(habit_id: int, db: Session) -> int:
-    """Calcular la racha más larga de un hábito"""
-    logs = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.completed == True
-    ).order_by(HabitLog.date).all()
+def current_streak_from_dates(dates: List[date]) -> int:
+    """Calcular la racha actual a partir de fechas completadas en orden ascendente"""
+    if not dates:
+        return 0
     
-    if not logs:
+    return current_streak_from_state(dates[-1], trailing_streak_from_dates(dates))
+
+def longest_streak_from_dates(dates: List[date]) -> int:
+    """Calcular la racha más larga a partir de fechas completadas en orden ascendente"""
+    if not dates:
         return 0
     
     max_streak = 1
     current_streak = 1
     
-    for i in range(1, len(logs)):
-        if (logs[i].date - logs[i-1].date).days == 1:
+    for i in range(1, len(dates)):
+        if (dates[i] - dates[i-1]).days == 1:
             current_streak += 1
             max_streak = max(max_streak, current_streak)
         else:
@@ -52,16 +54,25 @@ def calculate_longest_streak(habit_id: int, db: Session) -> int:
     
     return max_streak
 
+def calculate_streak(habit_id: int, db: Session) -> int:
+    """Calcular la racha actual de un hábito"""
+    history = load_history(db, habit_id)
+    return current_streak_from_state(history.last_completed(), history.trailing_streak())
+
+def calculate_longest_streak(habit_id: int, db: Session) -> int:
+    """Calcular la racha más larga de un hábito"""
+    return load_history(db, habit_id).longest_streak()
+
 def calculate_completion_rate(habit_id: int, db: Session, days: int = 30) -> float:
     """Calcular tasa de cumplimiento para los últimos N días"""
     start_date = date.today() - timedelta(days=days)
     
-    completed_logs = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.date >= start_date,
-        HabitLog.completed == True
-    ).count()
+    completed_logs = load_history(db, habit_id, since=start_date).count_since(start_date)
     
+    return completion_rate_from_count(completed_logs, days)
+
+def completion_rate_from_count(completed_logs: int, days: int = 30) -> float:
+    """Convertir un conteo de días completados en porcentaje de cumplimiento"""
     if days == 0:
         return 0.0
     
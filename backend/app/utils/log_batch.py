@@ -0,0 +1,109 @@
+from datetime import date
+from typing import Dict, List, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+from app.database.upsert import upsert
+from app.models.models import Habit, HabitLog
+from app.schemas.schemas import HabitLogOperation, LogOperationAction
+from app.utils.log_changes import apply_log_changes
+
+def apply_log_operations(
+    db: Session, user_id: int, operations: List[HabitLogOperation], with_logs: bool = True
+) -> List[dict]:
+    """Aplicar un lote de operaciones sobre logs de varios hábitos en una sola transacción
+
+    La propiedad de cada hábito se verifica una vez, los logs existentes se leen
+    en una consulta y las escrituras se hacen con un único upsert multi-fila. Las
+    operaciones sobre la misma fecha se aplican en orden y cada resultado
+    muestra el log tal como quedó tras esa operación (de la fila guardada solo
+    salen ``id`` y ``created_at``); una operación que deja el log como estaba
+    da ``unchanged``. No confirma la transacción; sin el log si
+    ``with_logs`` es False, lo que ahorra releerlos.
+    """
+    habit_ids = {operation.habit_id for operation in operations}
+    habits = {
+        habit.id: habit
+        for habit in db.query(Habit).filter(
+            Habit.id.in_(habit_ids),
+            Habit.user_id == user_id
+        ).with_for_update().all()
+    }
+
+    keys = {(operation.habit_id, operation.date) for operation in operations if operation.habit_id in habits}
+    existing = _existing_logs(db, keys)
+    logs = {key: dict(values) for key, values in existing.items()}
+
+    outcomes = []
+    for index, operation in enumerate(operations):
+        if operation.habit_id not in habits:
+            outcomes.append((index, "error", None, None))
+            continue
+
+        key = (operation.habit_id, operation.date)
+        current = logs.get(key)
+        if operation.action == LogOperationAction.toggle:
+            # Igual que el endpoint de toggle: un día sin log pasa a completado
+            completed = not current["completed"] if current else True
+            notes = current["notes"] if current else None
+        else:
+            completed = operation.completed
+            if "notes" in operation.model_fields_set or not current:
+                notes = operation.notes
+            else:
+                notes = current["notes"]
+
+        values = {"id": current["id"] if current else None, "completed": completed, "notes": notes}
+        if not current:
+            status = "created"
+        else:
+            status = "unchanged" if values == current else "updated"
+        logs[key] = values
+        outcomes.append((index, status, key, {"completed": completed, "notes": notes}))
+
+    _write_logs(db, existing, logs)
+
+    changes = []
+    for (habit_id, log_date), values in logs.items():
+        was_completed = existing[(habit_id, log_date)]["completed"] if (habit_id, log_date) in existing else False
+        changes.append((habit_id, log_date, was_completed, values["completed"]))
+    apply_log_changes(db, habits, changes)
+
+    saved = {}
+    if logs and with_logs:
+        for log in db.query(HabitLog).filter(tuple_(HabitLog.habit_id, HabitLog.date).in_(list(logs))).all():
+            saved[(log.habit_id, log.date)] = log
+
+    results = []
+    for index, status, key, snapshot in outcomes:
+        if key is None:
+            results.append({"index": index, "status": status, "detail": "Habit not found"})
+            continue
+        log = saved.get(key)
+        if log is not None:
+            log = {"id": log.id, "habit_id": key[0], "date": key[1], "created_at": log.created_at, **snapshot}
+        results.append({"index": index, "status": status, "log": log})
+    return results
+
+def _existing_logs(db: Session, keys) -> Dict[Tuple[int, date], dict]:
+    """Logs existentes para los pares (habit_id, fecha) pedidos, en una consulta"""
+    existing = {}
+    if not keys:
+        return existing
+    rows = db.query(HabitLog.id, HabitLog.habit_id, HabitLog.date, HabitLog.completed, HabitLog.notes).filter(
+        tuple_(HabitLog.habit_id, HabitLog.date).in_(list(keys))
+    ).all()
+    for row in rows:
+        existing[(row.habit_id, row.date)] = {"id": row.id, "completed": row.completed, "notes": row.notes}
+    return existing
+
+def _write_logs(db: Session, existing, logs) -> None:
+    """Escribir los logs nuevos o modificados con un único upsert multi-fila"""
+    rows = [
+        {"habit_id": habit_id, "date": log_date, "completed": values["completed"], "notes": values["notes"]}
+        for (habit_id, log_date), values in logs.items()
+        if values != existing.get((habit_id, log_date))
+    ]
+    if rows:
+        # render_nulls: sin él el ORM omite las notas a None y parte el executemany en una sentencia por fila
+        statement = upsert(db, HabitLog, ["habit_id", "date"], update_columns=["completed", "notes"])
+        db.execute(statement.execution_options(render_nulls=True), rows)
@@ -0,0 +1,41 @@
+from datetime import date
+from typing import Dict, Iterable, Tuple
+from sqlalchemy.orm import Session
+from app.models.models import Habit
+from app.utils.bitmap import mark_day, mark_days
+from app.utils.rollups import record_completion_changes
+from app.utils.streaks import set_streak_state, update_streak_state
+
+def apply_log_change(
+    db: Session, habit: Habit, log_date: date, was_completed: bool, is_completed: bool
+) -> None:
+    """Mantener el estado derivado de un hábito (bitmap, rachas y acumulados) tras escribir un log"""
+    if bool(was_completed) == bool(is_completed):
+        return
+
+    # El bitmap va primero: los recálculos de rachas se apoyan en él
+    mark_day(db, habit.id, log_date, is_completed)
+    update_streak_state(db, habit, log_date, is_completed)
+    record_completion_changes(db, [(habit.user_id, habit.id, log_date, 1 if is_completed else -1)])
+
+def apply_log_changes(
+    db: Session, habits: Dict[int, Habit], changes: Iterable[Tuple[int, date, bool, bool]]
+) -> None:
+    """Versión por lotes de apply_log_change para cambios (habit_id, día, antes, después)
+
+    Lee los bitmaps de todos los hábitos afectados en una consulta, recalcula
+    el estado de rachas de cada hábito una sola vez y actualiza los acumulados
+    con un upsert multi-fila.
+    """
+    changed = [
+        (habit_id, log_date, is_completed)
+        for habit_id, log_date, was_completed, is_completed in changes
+        if bool(was_completed) != bool(is_completed)
+    ]
+    histories = mark_days(db, changed)
+    for habit_id, history in histories.items():
+        set_streak_state(habits[habit_id], history)
+    record_completion_changes(db, (
+        (habits[habit_id].user_id, habit_id, log_date, 1 if is_completed else -1)
+        for habit_id, log_date, is_completed in changed
+    ))
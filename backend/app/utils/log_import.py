@@ -0,0 +1,188 @@
+"""Importación en streaming de logs históricos (CSV o NDJSON)
+
+El archivo se lee fila a fila; cada bloque de IMPORT_CHUNK_SIZE filas se valida
+contra HabitLogCreate y se escribe con apply_log_operations (upsert multi-fila y
+estado derivado en bloque) en su propia transacción, así que la memoria no
+depende del tamaño del archivo. Acepta también lo que produce /api/export.
+"""
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from typing import IO, Iterator, List, Optional, Set, Tuple
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from app.schemas.schemas import ExportFormat, HabitLogCreate, HabitLogOperation, LogOperationAction
+from app.utils.log_batch import apply_log_operations
+from app.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Solo se detallan los primeros errores; el resto solo se cuenta
+MAX_IMPORT_ERRORS = int(os.getenv("MAX_IMPORT_ERRORS", "100"))
+
+# Errores de lectura del archivo (codificación, gzip corrupto, CSV malformado)
+READ_ERRORS = (UnicodeDecodeError, EOFError, OSError, csv.Error)
+
+IMPORTED_ROWS = Counter("import_rows_total", "Rows processed by log imports", labelnames=("status",))
+
+@dataclass
+class ImportReport:
+    processed: int = 0
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    error_count: int = 0
+    errors: List[dict] = field(default_factory=list)
+    habit_ids: Set[int] = field(default_factory=set)
+
+    def error(self, row: int, detail: str) -> None:
+        self.error_count += 1
+        IMPORTED_ROWS.inc(status="error")
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append({"row": row, "detail": detail})
+
+    def summary(self) -> dict:
+        result = asdict(self)
+        del result["habit_ids"]
+        # Los errores de escritura de un bloque llegan después de los de validación
+        result["errors"].sort(key=lambda error: error["row"])
+        return result
+
+def open_text(binary: IO[bytes]) -> IO[str]:
+    """Texto del archivo subido, descomprimiendo al vuelo si viene en gzip"""
+    if binary.read(2) == b"\x1f\x8b":
+        binary.seek(0)
+        binary = gzip.GzipFile(fileobj=binary, mode="rb")
+    else:
+        binary.seek(0)
+    return io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+
+def detect_format(filename: Optional[str]) -> ExportFormat:
+    """Formato por la extensión del archivo (NDJSON si no es .csv)"""
+    name = (filename or "").lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return ExportFormat.csv if name.endswith(".csv") else ExportFormat.ndjson
+
+def read_records(stream: IO[str], format: ExportFormat) -> Iterator[Tuple[int, object]]:
+    """Registros del archivo con su número de línea; las líneas NDJSON ilegibles dan None"""
+    if format == ExportFormat.csv:
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+def _operation(record: object, habit_id: Optional[int]) -> HabitLogOperation:
+    if not isinstance(record, dict):
+        raise ValueError("Row is not an object")
+    # En CSV una celda vacía es un campo ausente
+    values = {key: value for key, value in record.items() if key is not None and value not in ("", None)}
+    log = HabitLogCreate.model_validate(values)
+    try:
+        target = int(values.get("habit_id", habit_id))
+    except (TypeError, ValueError):
+        raise ValueError("Missing or invalid habit_id")
+    # Ya validado: construir la operación sin validar otra vez, conservando los campos presentes
+    return HabitLogOperation.model_construct(
+        _fields_set={"habit_id", "action", *log.model_fields_set},
+        habit_id=target, action=LogOperationAction.upsert, **dict(log)
+    )
+
+def upload_chunks(
+    binary: IO[bytes],
+    filename: Optional[str],
+    format: Optional[ExportFormat],
+    report: ImportReport,
+    habit_id: Optional[int] = None,
+) -> Iterator[List[Tuple[int, HabitLogOperation]]]:
+    """Bloques validados de un archivo subido, que se abre al pedir el primero (ya en el hilo de importación)"""
+    stream = open_text(binary)
+    try:
+        yield from validated_chunks(stream, format or detect_format(filename), report, habit_id)
+    finally:
+        # Soltar el archivo sin cerrarlo: lo cierra FastAPI
+        stream.detach()
+
+def validated_chunks(
+    stream: IO[str],
+    format: ExportFormat,
+    report: ImportReport,
+    habit_id: Optional[int] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> Iterator[List[Tuple[int, HabitLogOperation]]]:
+    """Bloques de operaciones válidas (fila, operación); las filas inválidas van al informe"""
+    records = read_records(stream, format)
+    while True:
+        block = list(islice(records, chunk_size))
+        if not block:
+            return
+        chunk = []
+        for row, record in block:
+            report.processed += 1
+            # Los hábitos de una exportación se ignoran: solo se importan logs
+            if isinstance(record, dict) and record.get("type") not in (None, "", "log"):
+                report.skipped += 1
+                IMPORTED_ROWS.inc(status="skipped")
+                continue
+            if record is None:
+                report.error(row, "Invalid JSON")
+                continue
+            try:
+                chunk.append((row, _operation(record, habit_id)))
+            except ValidationError as error:
+                report.error(row, "; ".join(
+                    f"{'.'.join(map(str, detail['loc'])) or 'row'}: {detail['msg']}" for detail in error.errors()
+                ))
+            except ValueError as error:
+                report.error(row, str(error))
+        if chunk:
+            yield chunk
+
+def import_chunk(db: Session, user_id: int, chunk: List[Tuple[int, HabitLogOperation]], report: ImportReport) -> None:
+    """Escribir un bloque validado (sin confirmar) y anotar el resultado de cada fila"""
+    results = apply_log_operations(db, user_id, [operation for _, operation in chunk], with_logs=False)
+    for (row, operation), result in zip(chunk, results):
+        if result["status"] == "error":
+            report.error(row, result["detail"])
+            continue
+        # Una fila idéntica al log guardado no se escribe: cuenta como omitida
+        status = "skipped" if result["status"] == "unchanged" else result["status"]
+        if status != "skipped":
+            report.habit_ids.add(operation.habit_id)
+        setattr(report, status, getattr(report, status) + 1)
+        IMPORTED_ROWS.inc(status=status)
+    logger.info(
+        "Import for user %s: %s rows processed, %s created, %s updated, %s errors",
+        user_id, report.processed, report.created, report.updated, report.error_count
+    )
+
+def import_next_chunk(
+    db: Session,
+    user_id: int,
+    chunks: Iterator[List[Tuple[int, HabitLogOperation]]],
+    report: ImportReport
+) -> bool:
+    """Leer, validar, escribir y confirmar el siguiente bloque; False al acabar el archivo
+
+    Síncrono de principio a fin para ejecutarlo en un hilo por bloque sin
+    bloquear el event loop.
+    """
+    chunk = next(chunks, None)
+    if chunk is None:
+        return False
+    import_chunk(db, user_id, chunk, report)
+    db.commit()
+    return True
@@ -0,0 +1,8 @@
+"""Comprobaciones de propiedad como EXISTS, sin cargar la entidad"""
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Habit
+
+async def owns_habit(db: AsyncSession, user_id: int, habit_id: int) -> bool:
+    """El hábito existe y pertenece al usuario (resuelto con el índice, sin leer la fila)"""
+    return bool(await db.scalar(select(exists().where(Habit.id == habit_id, Habit.user_id == user_id))))
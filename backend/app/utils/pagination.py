@@ -0,0 +1,62 @@
+"""Paginación por cursor (keyset) con cursores opacos"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from typing import List, Optional, Sequence
+import json
+import os
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+def page_size(limit: Optional[int]) -> int:
+    """Tamaño de página pedido, acotado por el máximo del servidor"""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def _to_json(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def encode_cursor(kind: str, values: Sequence) -> str:
+    """Cursor opaco con los valores de la clave de orden de la última fila"""
+    payload = json.dumps({"k": kind, "v": [_to_json(value) for value in values]}, separators=(",", ":"))
+    return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(kind: str, cursor: str, types: Sequence[type]) -> Optional[List]:
+    """Valores de un cursor (None si es la primera página); 400 si no es válido para este listado"""
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["k"] != kind or len(payload["v"]) != len(types):
+            raise ValueError(cursor)
+        values = []
+        for value, type_ in zip(payload["v"], types):
+            values.append(type_.fromisoformat(value) if type_ in (date, datetime) else type_(value))
+        return values
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after(columns: Sequence, values: Sequence, descending: bool = False):
+    """Condición keyset "fila posterior al cursor" expandida (usa bien los índices en MySQL)
+
+    (a, b) > (x, y)  equivale a  a > x OR (a = x AND b > y)
+    """
+    conditions = []
+    for index, column in enumerate(columns):
+        equal = [columns[i] == values[i] for i in range(index)]
+        beyond = column < values[index] if descending else column > values[index]
+        conditions.append(and_(*equal, beyond))
+    return or_(*conditions)
+
+def keyset_page(kind: str, rows: Sequence, size: int, key) -> dict:
+    """Página a partir de ``size + 1`` filas: la fila extra indica que hay más"""
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(kind, key(rows[-1]))
+    return {"items": rows, "next_cursor": next_cursor}
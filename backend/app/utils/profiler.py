@@ -0,0 +1,184 @@
+"""Perfilado bajo demanda de una muestra de peticiones, limitado en el tiempo
+
+Dos modos:
+
+- ``sample``: un temporizador SIGPROF interrumpe el hilo principal cada
+  ``interval`` segundos de CPU y anota la pila si el código interrumpido
+  pertenece a una petición perfilada (se sabe por una ContextVar, que también
+  viaja a los greenlets de run_sync). Resultado en pilas colapsadas
+  (flamegraph.pl, speedscope). Necesita el event loop en el hilo principal,
+  como con uvicorn.
+- ``cprofile``: cProfile alrededor de las peticiones elegidas, de una en una;
+  incluye lo que otras tareas ejecuten entre medias. Resultado en formato pstats.
+
+Sin sesión activa el middleware solo comprueba ``active_session``. La sesión se
+apaga sola al vencer su duración o al alcanzar ``max_requests``. El estado es
+por proceso: con varios workers solo se perfila el que recibió la orden.
+"""
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Optional
+import cProfile
+import io
+import os
+import pstats
+import random
+import signal
+import threading
+import time
+from starlette.routing import Match
+
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+# Profundidad máxima de pila que se guarda por muestra
+PROFILER_MAX_DEPTH = int(os.getenv("PROFILER_MAX_DEPTH", "64"))
+
+class ProfilerMode(str, Enum):
+    sample = "sample"
+    cprofile = "cprofile"
+
+class ProfilerUnavailable(Exception):
+    """El modo pedido no puede funcionar en este proceso"""
+
+@dataclass
+class ProfileSession:
+    mode: ProfilerMode
+    route: Optional[str]
+    duration: float
+    sample_rate: float = 1.0
+    interval: float = 0.005
+    max_requests: Optional[int] = None
+    started_at: float = field(default_factory=time.time)
+    expires_at: float = 0.0
+    stopped: bool = False
+    requests_profiled: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    stats: Optional[pstats.Stats] = None
+    _busy: bool = False
+
+    def __post_init__(self):
+        self.expires_at = time.monotonic() + self.duration
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def expired(self) -> bool:
+        return self.stopped or time.monotonic() >= self.expires_at or (
+            self.max_requests is not None and self.requests_profiled >= self.max_requests
+        )
+
+    def status(self) -> dict:
+        return {
+            "active": not self.expired(),
+            "mode": self.mode,
+            "route": self.route,
+            "started_at": self.started_at,
+            "remaining_seconds": max(0.0, round(self.expires_at - time.monotonic(), 1)) if not self.expired() else 0.0,
+            "requests_profiled": self.requests_profiled,
+            "samples": self.samples,
+        }
+
+    def wants(self, scope) -> Optional[str]:
+        """Plantilla de ruta de la petición si hay que perfilarla"""
+        if self.expired():
+            stop_profiling()
+            return None
+        if self.mode == ProfilerMode.cprofile and self._busy:
+            return None
+        route = _match_route(scope)
+        if self.route is not None and route != self.route:
+            return None
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return None
+        return route or "unmatched"
+
+    async def profile(self, route: str, app, scope, receive, send) -> None:
+        self.requests_profiled += 1
+        if self.mode == ProfilerMode.sample:
+            token = _profiled_route.set(route)
+            try:
+                await app(scope, receive, send)
+            finally:
+                _profiled_route.reset(token)
+            return
+        # cProfile perfila el hilo entero: una petición a la vez
+        self._busy = True
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await app(scope, receive, send)
+        finally:
+            profile.disable()
+            self._busy = False
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def pstats_text(self, sort: str = "cumulative", limit: int = 50) -> str:
+        if self.stats is None:
+            return ""
+        stream = io.StringIO()
+        self.stats.stream = stream
+        self.stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+active_session: Optional[ProfileSession] = None
+last_session: Optional[ProfileSession] = None
+
+_profiled_route: ContextVar[Optional[str]] = ContextVar("profiled_route", default=None)
+
+def _match_route(scope) -> Optional[str]:
+    # El router aún no ha resuelto la petición: se buscan las rutas de la app (solo con sesión activa)
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return None
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+def _on_sample(signum, frame) -> None:
+    session = active_session
+    if session is None or session.expired():
+        # Se apaga solo aunque no lleguen más peticiones
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        return
+    route = _profiled_route.get()
+    if route is None or frame is None:
+        return
+    labels = []
+    while frame is not None and len(labels) < PROFILER_MAX_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(route)
+    session.stacks[";".join(reversed(labels))] += 1
+
+def start_profiling(session: ProfileSession) -> ProfileSession:
+    """Activar una sesión; el modo sample debe iniciarse desde el hilo principal"""
+    global active_session, last_session
+    if session.mode == ProfilerMode.sample:
+        if threading.current_thread() is not threading.main_thread() or not hasattr(signal, "setitimer"):
+            raise ProfilerUnavailable("Sampling needs the event loop in the main thread; use mode=cprofile")
+        signal.signal(signal.SIGPROF, _on_sample)
+        signal.setitimer(signal.ITIMER_PROF, session.interval, session.interval)
+    active_session = last_session = session
+    return session
+
+def stop_profiling() -> Optional[ProfileSession]:
+    """Desactivar la sesión en curso (sus resultados se conservan hasta la siguiente)"""
+    global active_session
+    session, active_session = active_session, None
+    if session is not None:
+        session.stopped = True
+        if session.mode == ProfilerMode.sample and threading.current_thread() is threading.main_thread():
+            signal.setitimer(signal.ITIMER_PROF, 0)
+    return last_session
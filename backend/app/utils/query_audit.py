@@ -0,0 +1,255 @@
+"""Auditoría de planes de ejecución de las consultas calientes
+
+Cada ruta caliente registrada (una corrutina que recibe la AsyncSession) se
+ejecuta contra un conjunto de datos sembrado;
+se capturan sus SELECT y se pasan por EXPLAIN. Cualquier recorrido completo de
+una tabla del modelo (sin índice) se reporta como violación.
+"""
+import asyncio
+import json
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from app.auth.user_cache import AuthenticatedUser
+from app.database.database import Base, async_database_url
+from app.models.models import Habit, HabitLog, User
+
+HOT_PATHS: Dict[str, Callable[[AsyncSession, "AuditContext"], Awaitable[object]]] = {}
+
+# "SCAN habit_logs" sin "USING ... INDEX" es un recorrido completo de la tabla
+_SQLITE_FULL_SCAN = re.compile(r"^SCAN (\w+)(?! USING)")
+
+@dataclass
+class AuditContext:
+    """Datos sembrados que reciben las rutas calientes"""
+    user: AuthenticatedUser
+    habit_ids: List[int]
+    log_id: int
+    today: date
+
+@dataclass
+class PlanViolation:
+    path: str
+    table: str
+    statement: str
+    detail: str
+
+    def __str__(self):
+        return f"{self.path}: full scan on {self.table} ({self.detail})\n    {self.statement}"
+
+def hot_path(name: str):
+    """Registrar una corrutina que ejecuta las consultas de una ruta caliente"""
+    def decorator(func):
+        HOT_PATHS[name] = func
+        return func
+    return decorator
+
+def seed_dataset(db: Session, users: int = 3, habits_per_user: int = 5, days: int = 120) -> AuditContext:
+    """Sembrar usuarios, hábitos y logs suficientes para que los planes sean realistas"""
+    from app.utils.bitmap import rebuild_bitmaps
+    from app.utils.rollups import rebuild_rollups
+    from app.utils.streaks import rebuild_streak_states
+
+    today = date.today()
+    for user_index in range(users):
+        user = User(email=f"audit{user_index}@example.com", username=f"audit{user_index}", hashed_password="x")
+        db.add(user)
+        db.flush()
+        for habit_index in range(habits_per_user):
+            habit = Habit(
+                user_id=user.id,
+                name=f"Habit {habit_index}",
+                is_active=habit_index % 4 != 3
+            )
+            db.add(habit)
+            db.flush()
+            db.add_all(
+                HabitLog(habit_id=habit.id, date=today - timedelta(days=offset), completed=offset % (habit_index + 2) != 0)
+                for offset in range(days)
+            )
+    db.commit()
+    rebuild_bitmaps(db)
+    rebuild_streak_states(db)
+    rebuild_rollups(db)
+
+    user = db.query(User).order_by(User.id).first()
+    habit_ids = [row.id for row in db.query(Habit.id).filter(Habit.user_id == user.id).order_by(Habit.id)]
+    log_id = db.query(HabitLog.id).filter(HabitLog.habit_id == habit_ids[0]).order_by(HabitLog.id).first().id
+    return AuditContext(user=AuthenticatedUser.from_user(user), habit_ids=habit_ids, log_id=log_id, today=today)
+
+@contextmanager
+def _capture_selects(engine):
+    """Capturar las sentencias SELECT que se ejecutan en el engine"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def _full_scans(db: Session, statement: str, parameters) -> List[tuple]:
+    """Tablas del modelo que el plan recorre completas: [(tabla, detalle)]"""
+    conn = db.connection()
+    dialect = conn.dialect.name
+    tables = set(Base.metadata.tables)
+    scans = []
+
+    if dialect == "sqlite":
+        for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters):
+            detail = row[-1]
+            match = _SQLITE_FULL_SCAN.match(detail)
+            if match and match.group(1) in tables:
+                scans.append((match.group(1), detail))
+    elif dialect in ("mysql", "mariadb"):
+        for row in conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings():
+            if row["type"] == "ALL" and row["table"] in tables:
+                scans.append((row["table"], f"type=ALL rows={row['rows']}"))
+    elif dialect == "postgresql":
+        # Con pocas filas el planificador prefiere Seq Scan aunque exista el índice
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        nodes = [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in tables:
+                scans.append((node["Relation Name"], "Seq Scan"))
+            nodes.extend(node.get("Plans", []))
+    else:
+        raise NotImplementedError(f"Query plan audit is not supported for dialect '{dialect}'")
+    return scans
+
+async def audit_query_plans(db: AsyncSession, context: AuditContext, paths: Optional[List[str]] = None) -> List[PlanViolation]:
+    """Ejecutar las rutas calientes y devolver los recorridos completos de sus consultas"""
+    engine = db.get_bind()
+    violations = []
+    for name in paths or sorted(HOT_PATHS):
+        with _capture_selects(engine) as statements:
+            await HOT_PATHS[name](db, context)
+            await db.flush()
+        for statement, parameters in statements:
+            for table, detail in await db.run_sync(_full_scans, statement, parameters):
+                violations.append(PlanViolation(name, table, " ".join(statement.split()), detail))
+        # Descartar lo que la ruta haya dejado sin confirmar
+        await db.rollback()
+    return violations
+
+async def _run_audit(database_url: str, paths: Optional[List[str]]) -> List[PlanViolation]:
+    engine = create_async_engine(async_database_url(database_url))
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine, autoflush=False, expire_on_commit=False) as db:
+            context = await db.run_sync(seed_dataset)
+            return await audit_query_plans(db, context, paths)
+    finally:
+        await engine.dispose()
+
+def run_audit(database_url: str = "sqlite://", paths: Optional[List[str]] = None) -> List[PlanViolation]:
+    """Crear el esquema en una base de datos de prueba, sembrarla y auditar los planes"""
+    return asyncio.run(_run_audit(database_url, paths))
+
+# Rutas calientes: llaman a los mismos handlers y helpers que sirven la API
+
+def _next_cursor(page) -> str:
+    # Con FAST_LIST_RESPONSES la ruta devuelve la respuesta ya serializada
+    if isinstance(page, Response):
+        page = json.loads(page.body)
+    return page["next_cursor"]
+
+@hot_path("habits.list")
+async def _habits_list(db: AsyncSession, context: AuditContext):
+    from app.routes.habits import get_habits
+    await get_habits(skip=0, limit=100, active_only=True, cursor=None, response=Response(), db=db, current_user=context.user)
+    await get_habits(skip=0, limit=100, active_only=False, cursor=None, response=Response(), db=db, current_user=context.user)
+    # Modo cursor: primera página y la siguiente
+    page = await get_habits(skip=0, limit=1, active_only=True, cursor="", response=Response(), db=db, current_user=context.user)
+    await get_habits(skip=0, limit=1, active_only=True, cursor=_next_cursor(page), response=Response(), db=db, current_user=context.user)
+
+@hot_path("logs.list")
+async def _logs_list(db: AsyncSession, context: AuditContext):
+    from app.routes.logs import get_habit_logs
+    await get_habit_logs(habit_id=context.habit_ids[0], days=30, cursor=None, limit=None, response=Response(), db=db, current_user=context.user)
+    await get_habit_logs(habit_id=context.habit_ids[0], days=30, cursor=None, limit=None, fields="date,completed", response=Response(), db=db, current_user=context.user)
+    page = await get_habit_logs(habit_id=context.habit_ids[0], days=30, cursor="", limit=5, response=Response(), db=db, current_user=context.user)
+    await get_habit_logs(habit_id=context.habit_ids[0], days=30, cursor=_next_cursor(page), limit=5, response=Response(), db=db, current_user=context.user)
+
+@hot_path("logs.heatmap")
+async def _logs_heatmap(db: AsyncSession, context: AuditContext):
+    from app.routes.logs import get_heatmap
+    from app.schemas.schemas import HeatmapEncoding
+    await get_heatmap(start=None, end=None, habit_ids=None, encoding=HeatmapEncoding.bits, db=db, current_user=context.user)
+    await get_heatmap(start=None, end=None, habit_ids=context.habit_ids[:2], encoding=HeatmapEncoding.rle, db=db, current_user=context.user)
+
+@hot_path("logs.toggle")
+async def _logs_toggle(db: AsyncSession, context: AuditContext):
+    from app.routes.logs import toggle_habit_log
+    await toggle_habit_log(habit_id=context.habit_ids[0], log_date=context.today, db=db, current_user=context.user)
+
+@hot_path("logs.update")
+async def _logs_update(db: AsyncSession, context: AuditContext):
+    from app.routes.logs import update_habit_log
+    from app.schemas.schemas import HabitLogUpdate
+    await update_habit_log(log_id=context.log_id, log_update=HabitLogUpdate(completed=False), db=db, current_user=context.user)
+
+@hot_path("export.user")
+async def _export_user(db: AsyncSession, context: AuditContext):
+    from app.utils.export import export_batches
+    async for _ in export_batches(db, context.user.id):
+        pass
+
+@hot_path("stats.habit")
+async def _stats_habit(db: AsyncSession, context: AuditContext):
+    from app.routes.stats import get_habit_stats
+    await get_habit_stats(habit_id=context.habit_ids[0], db=db, current_user=context.user)
+
+@hot_path("stats.habits")
+async def _stats_habits(db: AsyncSession, context: AuditContext):
+    from app.routes.stats import get_habits_stats
+    await get_habits_stats(ids=None, db=db, current_user=context.user)
+    await get_habits_stats(ids=context.habit_ids[:2], db=db, current_user=context.user)
+
+@hot_path("stats.overall")
+async def _stats_overall(db: AsyncSession, context: AuditContext):
+    from app.routes.stats import get_overall_stats
+    await get_overall_stats(db=db, current_user=context.user)
+
+@hot_path("stats.goals")
+async def _stats_goals(db: AsyncSession, context: AuditContext):
+    from app.routes.stats import get_weekly_goals
+    await get_weekly_goals(weeks=12, db=db, current_user=context.user)
+
+@hot_path("stats.trend")
+async def _stats_trend(db: AsyncSession, context: AuditContext):
+    from app.routes.stats import get_trend
+    from app.schemas.schemas import TrendGranularity
+    await get_trend(days=365, granularity=TrendGranularity.week, db=db, current_user=context.user)
+
+@hot_path("helpers.streaks")
+async def _helpers_streaks(db: AsyncSession, context: AuditContext):
+    from app.utils.helpers import calculate_completion_rate, calculate_longest_streak, calculate_streak
+    for helper in (calculate_streak, calculate_longest_streak, calculate_completion_rate):
+        await db.run_sync(lambda session: helper(context.habit_ids[0], session))
+
+@hot_path("aggregates.completion_rates")
+async def _aggregates_completion_rates(db: AsyncSession, context: AuditContext):
+    from app.utils.aggregates import completion_rates
+    await db.run_sync(completion_rates, context.user.id)
+    await db.run_sync(completion_rates, context.user.id, context.habit_ids[:2])
+
+@hot_path("streaks.rebuild")
+async def _streaks_rebuild(db: AsyncSession, context: AuditContext):
+    # Lotes por id de hábito: count_completions y streak_runs sin filtro de usuario
+    from app.utils.streaks import rebuild_streak_states
+    await db.run_sync(rebuild_streak_states)
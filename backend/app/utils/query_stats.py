@@ -0,0 +1,144 @@
+"""Consultas SQL por petición: número, tiempo en base de datos y sentencias repetidas (N+1)
+
+Los eventos del engine acumulan en el QueryStats de la petición en curso
+(una ContextVar que abre RequestMetricsMiddleware); fuera de una petición no
+se mide nada.
+"""
+from collections import Counter as StatementCounter
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Tuple
+import logging
+import os
+import re
+import time
+from fastapi import Request
+from sqlalchemy import event
+from app.utils.metrics import Counter, Histogram
+
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Veces que puede repetirse la misma sentencia en una petición antes de avisar de un posible N+1
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+# Estricto (tests): superar el presupuesto de la ruta lanza QueryBudgetExceeded en lugar de solo avisar
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements executed per request",
+    labelnames=("route",), buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+REPEATED_STATEMENTS = Counter(
+    "db_repeated_statements_total", "Requests that repeated a statement QUERY_REPEAT_THRESHOLD times or more (possible N+1)",
+    labelnames=("route",)
+)
+BUDGET_EXCEEDED = Counter("db_query_budget_exceeded_total", "Requests that exceeded their route's query budget", labelnames=("route",))
+
+# Listas de parámetros de IN de distinta longitud son la misma sentencia
+_PARAMETER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+class QueryBudgetExceeded(Exception):
+    """La ruta ejecutó más consultas que las declaradas con query_budget (modo estricto)"""
+
+    def __init__(self, route: str, budget: int, statement: str):
+        super().__init__(f"{route} exceeded its query budget of {budget}: {statement[:200]}")
+        self.route = route
+        self.budget = budget
+        self.statement = statement
+
+@dataclass
+class QueryStats:
+    """Consultas de una petición"""
+    count: int = 0
+    seconds: float = 0.0
+    statements: StatementCounter = field(default_factory=StatementCounter)
+    budget: Optional[int] = None
+    route: str = "unmatched"
+
+    def repeated(self):
+        """Sentencias que alcanzan el umbral de repetición, de más a menos frecuente"""
+        return [(statement, times) for statement, times in self.statements.most_common() if times >= QUERY_REPEAT_THRESHOLD]
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+def normalize_statement(statement: str) -> str:
+    return _PARAMETER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+def instrument_queries(engine) -> None:
+    """Contar y cronometrar las sentencias del engine (sync o async) en la petición en curso"""
+    engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is None:
+            return
+        if QUERY_BUDGET_STRICT and stats.budget is not None and stats.count >= stats.budget:
+            raise QueryBudgetExceeded(stats.route, stats.budget, statement)
+        stats.count += 1
+        stats.statements[normalize_statement(statement)] += 1
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if started and _current.get() is not None:
+            _current.get().seconds += time.perf_counter() - started.pop()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        started = conn.info.get("query_started") if conn is not None else None
+        if started:
+            started.pop()
+
+def query_budget(limit: int):
+    """Dependencia que declara cuántas consultas puede ejecutar una ruta
+
+    Uso: ``@router.get(..., dependencies=[Depends(query_budget(3))])``. El
+    presupuesto cubre toda la petición, incluida la autenticación.
+    """
+    def dependency(request: Request) -> None:
+        stats = _current.get()
+        if stats is not None:
+            stats.budget = limit
+            route = request.scope.get("route")
+            if route is not None:
+                stats.route = route.path
+    return dependency
+
+def begin_request() -> Tuple[QueryStats, Token]:
+    """Abrir el QueryStats de una petición; cerrarlo con ``end_request(token)``"""
+    stats = QueryStats()
+    return stats, _current.set(stats)
+
+def end_request(token: Token) -> None:
+    _current.reset(token)
+
+def report_query_stats(stats: QueryStats, route: str, describe: Callable[[], dict]) -> None:
+    """Registrar las consultas de la petición y avisar de N+1 o de presupuesto superado
+
+    ``describe`` da los campos del log; solo se llama si hay que avisar.
+    """
+    stats.route = route
+    QUERIES_PER_REQUEST.observe(stats.count, route=route)
+    repeated = stats.repeated() if stats.count >= QUERY_REPEAT_THRESHOLD else []
+    over_budget = stats.budget is not None and stats.count > stats.budget
+    if not repeated and not over_budget:
+        return
+    fields = describe()
+    message = " ".join(f"{name}={value}" for name, value in fields.items())
+    if repeated:
+        REPEATED_STATEMENTS.inc(route=route)
+        statement, times = repeated[0]
+        logger.warning(
+            "Repeated statement (possible N+1) %s repeats=%s statement=%r", message, times, statement[:200],
+            extra={**fields, "repeats": times, "statement": statement}
+        )
+    if over_budget:
+        BUDGET_EXCEEDED.inc(route=route)
+        logger.warning("Query budget exceeded %s budget=%s", message, stats.budget, extra={**fields, "budget": stats.budget})
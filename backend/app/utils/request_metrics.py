@@ -0,0 +1,129 @@
+"""Métricas por ruta y log de acceso muestreado, en un middleware ASGI
+
+Por petición se mide la latencia, el estado, el tiempo en base de datos
+(QueryStats) y en hashing de contraseñas; todo va a histogramas y contadores
+por plantilla de ruta (no por URL, para acotar la cardinalidad) y a la
+cabecera Server-Timing. Del log de acceso solo se escribe una muestra, más
+los errores 5xx y las peticiones lentas.
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+import logging
+import os
+import random
+import time
+from starlette.datastructures import MutableHeaders
+from app.utils import profiler
+from app.utils.metrics import Counter, Gauge, Histogram
+from app.utils.query_stats import QUERY_STATS_ENABLED, begin_request, end_request, report_query_stats
+
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "true").lower() in ("1", "true", "yes")
+# Fracción de peticiones que se escriben en el log de acceso (0 = ninguna, 1 = todas)
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0.01"))
+# Las peticiones más lentas que esto y los 5xx se registran siempre
+ACCESS_LOG_SLOW_SECONDS = float(os.getenv("ACCESS_LOG_SLOW_SECONDS", "1.0"))
+
+access_logger = logging.getLogger("app.access")
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency until the response is fully sent", labelnames=("method", "route"))
+REQUESTS = Counter("http_requests_total", "Requests by route and status code", labelnames=("method", "route", "status"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled")
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time per request spent executing SQL", labelnames=("route",))
+REQUEST_HASH_SECONDS = Histogram(
+    "http_request_password_hash_seconds", "Time per request spent waiting for password hashing",
+    labelnames=("route",), buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+)
+
+@dataclass
+class RequestTimings:
+    """Tiempos de la petición en curso que no son de SQL"""
+    hash_seconds: float = 0.0
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+def add_password_hash_time(seconds: float) -> None:
+    """Sumar al desglose de la petición en curso el tiempo esperando un hash"""
+    timings = _timings.get()
+    if timings is not None:
+        timings.hash_seconds += seconds
+
+def _route(scope) -> str:
+    # El router deja la ruta que atendió la petición en el scope; sin ella (404) no se usa la URL
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+def _server_timing(stats, timings: RequestTimings, elapsed: float) -> str:
+    parts = []
+    if stats is not None:
+        parts.append(f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries"')
+    if timings.hash_seconds:
+        parts.append(f"hash;dur={timings.hash_seconds * 1000:.2f}")
+    parts.append(f"app;dur={elapsed * 1000:.2f}")
+    return ", ".join(parts)
+
+class RequestMetricsMiddleware:
+    """Middleware ASGI puro: no envuelve la petición en tareas ni objetos Request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        stats, stats_token = begin_request() if QUERY_STATS_ENABLED else (None, None)
+        timings = RequestTimings()
+        timings_token = _timings.set(timings)
+        status = 500
+        IN_FLIGHT.inc()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # En respuestas en streaming solo cuenta lo ocurrido antes de empezar a enviar
+                if SERVER_TIMING_HEADER:
+                    MutableHeaders(scope=message).append("Server-Timing", _server_timing(stats, timings, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            # Sin sesión de perfilado el coste es esta comprobación
+            session = profiler.active_session
+            route = session.wants(scope) if session is not None else None
+            if route is not None:
+                await session.profile(route, self.app, scope, receive, send_with_timing)
+            else:
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            _timings.reset(timings_token)
+            if stats_token is not None:
+                end_request(stats_token)
+            self._record(scope, status, elapsed, stats, timings)
+
+    def _record(self, scope, status: int, elapsed: float, stats, timings: RequestTimings) -> None:
+        route = _route(scope)
+        method = scope["method"]
+        REQUEST_SECONDS.observe(elapsed, method=method, route=route)
+        REQUESTS.inc(method=method, route=route, status=status)
+        if timings.hash_seconds:
+            REQUEST_HASH_SECONDS.observe(timings.hash_seconds, route=route)
+        if stats is not None:
+            REQUEST_DB_SECONDS.observe(stats.seconds, route=route)
+            report_query_stats(stats, route, lambda: _fields(method, route, status, elapsed, stats, timings))
+        if status >= 500 or elapsed >= ACCESS_LOG_SLOW_SECONDS or random.random() < ACCESS_LOG_SAMPLE_RATE:
+            fields = _fields(method, route, status, elapsed, stats, timings)
+            access_logger.info(" ".join(f"{name}={value}" for name, value in fields.items()), extra=fields)
+
+def _fields(method: str, route: str, status: int, elapsed: float, stats, timings: RequestTimings) -> dict:
+    """Campos estructurados del log de acceso (sin query string: puede llevar el token)"""
+    fields = {"method": method, "route": route, "status": status, "duration_ms": round(elapsed * 1000, 2)}
+    if stats is not None:
+        fields["queries"] = stats.count
+        fields["db_ms"] = round(stats.seconds * 1000, 2)
+    if timings.hash_seconds:
+        fields["hash_ms"] = round(timings.hash_seconds * 1000, 2)
+    return fields
@@ -0,0 +1,160 @@
+"""Acumulados precalculados: completados por hábito y semana, y por usuario y día
+
+Se mantienen con incrementos en cada escritura de logs (apply_log_change[s]) y
+un reconciliador periódico los recalcula desde habit_logs, que sigue siendo la
+fuente de verdad. Las vistas de objetivos semanales y tendencias leen solo de aquí.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+import logging
+import os
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from app.database.upsert import upsert
+from app.models.models import Habit, HabitLog, HabitWeeklyRollup, User, UserDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto recalcular los acumulados desde habit_logs (0 desactiva el reconciliador)
+ROLLUP_RECONCILE_SECONDS = float(os.getenv("ROLLUP_RECONCILE_SECONDS", "3600"))
+# Usuarios con cambios en esta ventana (por defecto dos intervalos: una ejecución fallida no deja huecos)
+ROLLUP_RECONCILE_WINDOW_SECONDS = float(os.getenv("ROLLUP_RECONCILE_WINDOW_SECONDS", str(2 * ROLLUP_RECONCILE_SECONDS)))
+
+def week_start(day: date) -> date:
+    """Lunes de la semana del día"""
+    return day - timedelta(days=day.weekday())
+
+def record_completion_changes(db: Session, changes: Iterable[Tuple[int, int, date, int]]) -> None:
+    """Aplicar incrementos (user_id, habit_id, día, +1/-1) con un upsert multi-fila por tabla"""
+    weekly = Counter()
+    daily = Counter()
+    for user_id, habit_id, day, delta in changes:
+        weekly[(habit_id, week_start(day))] += delta
+        daily[(user_id, day)] += delta
+
+    weekly_rows = [
+        {"habit_id": habit_id, "week_start": week, "completions": delta}
+        for (habit_id, week), delta in weekly.items() if delta
+    ]
+    if weekly_rows:
+        db.execute(upsert(db, HabitWeeklyRollup, ["habit_id", "week_start"], increment_columns=["completions"]), weekly_rows)
+    now = datetime.utcnow()
+    daily_rows = [
+        {"user_id": user_id, "date": day, "completions": delta, "updated_at": now}
+        for (user_id, day), delta in daily.items() if delta
+    ]
+    if daily_rows:
+        db.execute(upsert(
+            db, UserDailyRollup, ["user_id", "date"], update_columns=["updated_at"], increment_columns=["completions"]
+        ), daily_rows)
+
+def remove_habit_from_rollups(db: Session, habit: Habit) -> None:
+    """Descontar del acumulado diario del usuario los días completados de un hábito que se borra
+
+    Sus filas semanales se borran en cascada con el hábito.
+    """
+    days = db.query(HabitLog.date).filter(HabitLog.habit_id == habit.id, HabitLog.completed == True)
+    record_completion_changes(db, ((habit.user_id, habit.id, row.date, -1) for row in days))
+
+def _sync_rows(db: Session, model, key_columns: Tuple[str, str], current: Dict[tuple, Tuple[int, int]], expected: Counter) -> int:
+    """Corregir solo las filas cuyo acumulado difiere del esperado; devuelve cuántas cambian
+
+    ``current`` va de clave a (id, completions). Las filas sobrantes quedan a
+    cero, igual que las que dejan los decrementos incrementales.
+    """
+    updates = [
+        {"id": row_id, "completions": expected.get(key, 0)}
+        for key, (row_id, completions) in current.items() if completions != expected.get(key, 0)
+    ]
+    inserts = [
+        dict(zip(key_columns, key), completions=count)
+        for key, count in expected.items() if key not in current
+    ]
+    if updates:
+        db.execute(update(model), updates)
+    if inserts:
+        db.execute(insert(model), inserts)
+    return len(updates) + len(inserts)
+
+def rebuild_rollups(
+    db: Session,
+    batch_size: int = 500,
+    user_id: Optional[int] = None,
+    changed_since: Optional[datetime] = None
+) -> int:
+    """Recalcular los acumulados desde habit_logs por lotes de usuarios
+
+    Cada lote bloquea los hábitos de sus usuarios (como las escrituras de logs)
+    y corrige solo las filas que difieren, en una transacción: un incremento
+    concurrente espera al lote en vez de perderse. Con ``changed_since`` solo
+    se revisan los usuarios cuyo acumulado diario cambió desde entonces.
+    Devuelve el número de usuarios procesados.
+    """
+    query = db.query(User.id).order_by(User.id)
+    if user_id is not None:
+        query = query.filter(User.id == user_id)
+    if changed_since is not None:
+        query = query.filter(User.id.in_(
+            db.query(UserDailyRollup.user_id).filter(UserDailyRollup.updated_at >= changed_since)
+        ))
+
+    processed = 0
+    corrected = 0
+    last_id = 0
+    while True:
+        user_ids = [row.id for row in query.filter(User.id > last_id).limit(batch_size).all()]
+        if not user_ids:
+            break
+
+        habit_ids = [
+            row.id for row in db.query(Habit.id).filter(
+                Habit.user_id.in_(user_ids)
+            ).order_by(Habit.id).with_for_update().all()
+        ]
+        weekly = Counter()
+        daily = Counter()
+        if habit_ids:
+            rows = db.query(Habit.user_id, HabitLog.habit_id, HabitLog.date).join(
+                Habit, Habit.id == HabitLog.habit_id
+            ).filter(
+                Habit.user_id.in_(user_ids),
+                HabitLog.completed == True
+            ).yield_per(10000)
+            for owner_id, habit_id, day in rows:
+                weekly[(habit_id, week_start(day))] += 1
+                daily[(owner_id, day)] += 1
+
+            current_weekly = {
+                (row.habit_id, row.week_start): (row.id, row.completions)
+                for row in db.query(
+                    HabitWeeklyRollup.id, HabitWeeklyRollup.habit_id, HabitWeeklyRollup.week_start, HabitWeeklyRollup.completions
+                ).filter(HabitWeeklyRollup.habit_id.in_(habit_ids))
+            }
+            corrected += _sync_rows(db, HabitWeeklyRollup, ("habit_id", "week_start"), current_weekly, weekly)
+        current_daily = {
+            (row.user_id, row.date): (row.id, row.completions)
+            for row in db.query(
+                UserDailyRollup.id, UserDailyRollup.user_id, UserDailyRollup.date, UserDailyRollup.completions
+            ).filter(UserDailyRollup.user_id.in_(user_ids))
+        }
+        corrected += _sync_rows(db, UserDailyRollup, ("user_id", "date"), current_daily, daily)
+        db.commit()
+
+        processed += len(user_ids)
+        last_id = user_ids[-1]
+    if corrected:
+        logger.info("Rollups: corrected %s rows that differed from habit_logs", corrected)
+    return processed
+
+def reconcile_rollups() -> None:
+    """Trabajo periódico: corregir la deriva de los acumulados de los usuarios con cambios recientes"""
+    from app.database.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        since = datetime.utcnow() - timedelta(seconds=ROLLUP_RECONCILE_WINDOW_SECONDS)
+        processed = rebuild_rollups(db, changed_since=since)
+    finally:
+        db.close()
+    logger.info("Rollups reconciled for %s recently changed users", processed)
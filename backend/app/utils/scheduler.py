@@ -0,0 +1,62 @@
+"""Tareas periódicas en proceso, arrancadas y paradas desde el lifespan de la aplicación"""
+from typing import Callable, List, Tuple
+import asyncio
+import logging
+import os
+import time
+from app.utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Con varios workers o réplicas, activarlo en un solo proceso (false en el resto)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+JOB_SECONDS = Histogram(
+    "scheduled_job_seconds", "Duration of periodic background jobs",
+    labelnames=("job",), buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+)
+JOB_FAILURES = Counter("scheduled_job_failures_total", "Periodic background jobs that raised", labelnames=("job",))
+
+class Scheduler:
+    """Ejecutar funciones síncronas cada cierto intervalo en un hilo, sin bloquear el event loop
+
+    Con varios workers cada uno tiene su planificador: los trabajos deben ser
+    idempotentes, y SCHEDULER_ENABLED=false los apaga en todos menos uno.
+    """
+
+    def __init__(self):
+        self._jobs: List[Tuple[str, float, Callable[[], object]]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, name: str, interval: float, func: Callable[[], object]) -> None:
+        """Registrar un trabajo; un intervalo <= 0 lo desactiva"""
+        if interval > 0:
+            self._jobs.append((name, interval, func))
+
+    async def _run(self, name: str, interval: float, func: Callable[[], object]) -> None:
+        while True:
+            # La primera ejecución espera un intervalo: el arranque ya hace los backfills
+            await asyncio.sleep(interval)
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(func)
+            except Exception:
+                JOB_FAILURES.inc(job=name)
+                logger.exception("Scheduled job %s failed", name)
+            finally:
+                JOB_SECONDS.observe(time.perf_counter() - started, job=name)
+
+    def start(self) -> None:
+        if not SCHEDULER_ENABLED:
+            if self._jobs:
+                logger.info("Scheduler disabled (SCHEDULER_ENABLED=false); periodic jobs will not run here")
+            return
+        self._tasks = [asyncio.create_task(self._run(*job), name=f"scheduler:{job[0]}") for job in self._jobs]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+scheduler = Scheduler()
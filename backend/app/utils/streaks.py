@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+from typing import Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.models.models import Habit
+from app.utils.aggregates import count_completions, streak_runs
+from app.utils.bitmap import CompletionHistory, load_history
+from app.utils.helpers import current_streak_from_state
+
+# Nota: Habit.current_streak guarda la racha que termina en Habit.last_completed;
+# la racha "actual" visible depende de la fecha de hoy (ver current_streak_for).
+
+def current_streak_for(habit: Habit) -> int:
+    """Racha actual de un hábito leída desde su estado desnormalizado"""
+    return current_streak_from_state(habit.last_completed, habit.current_streak or 0)
+
+def recompute_streak_state(db: Session, habit: Habit) -> None:
+    """Recalcular el estado de rachas de un hábito a partir de su bitmap de completados"""
+    # Los cambios pendientes de la sesión deben verse en la consulta
+    db.flush()
+    set_streak_state(habit, load_history(db, habit.id))
+
+def set_streak_state(habit: Habit, history: CompletionHistory) -> None:
+    """Copiar al hábito el estado de rachas calculado desde su historial"""
+    habit.total_completions = history.total()
+    habit.last_completed = history.last_completed()
+    habit.current_streak = history.trailing_streak()
+    habit.longest_streak = history.longest_streak()
+
+def update_streak_state(db: Session, habit: Habit, log_date: date, is_completed: bool) -> None:
+    """Actualizar incrementalmente el estado de rachas cuando un día cambia de estado
+
+    Los casos habituales (marcar hoy, desmarcar el último día) son O(1); los
+    cambios que rompen o unen rachas en medio del historial recalculan el hábito.
+    """
+    last = habit.last_completed
+
+    if is_completed:
+        if last is None or log_date > last + timedelta(days=1):
+            # Empieza una racha nueva después de la última fecha completada
+            habit.current_streak = 1
+        elif log_date == last + timedelta(days=1):
+            # Extiende la racha final
+            habit.current_streak += 1
+        else:
+            # Rellenar un hueco en el historial puede unir dos rachas
+            recompute_streak_state(db, habit)
+            return
+        habit.total_completions += 1
+        habit.last_completed = log_date
+        habit.longest_streak = max(habit.longest_streak, habit.current_streak)
+        return
+
+    if log_date == last and 1 < habit.current_streak < habit.longest_streak:
+        # Acortar la racha final no afecta a la racha más larga
+        habit.total_completions -= 1
+        habit.current_streak -= 1
+        habit.last_completed = log_date - timedelta(days=1)
+        return
+
+    # Romper una racha en medio del historial
+    recompute_streak_state(db, habit)
+
+def rebuild_streak_states(
+    db: Session, batch_size: int = 500, user_id: Optional[int] = None
+) -> int:
+    """Reconstruir el estado de rachas de los hábitos existentes por lotes
+
+    Cada lote usa un número constante de consultas y se confirma por separado.
+    Devuelve el número de hábitos procesados.
+    """
+    query = db.query(Habit.id).order_by(Habit.id)
+    if user_id is not None:
+        query = query.filter(Habit.user_id == user_id)
+
+    processed = 0
+    last_id = 0
+    while True:
+        habit_ids = [row.id for row in query.filter(Habit.id > last_id).limit(batch_size).all()]
+        if not habit_ids:
+            break
+
+        totals = count_completions(db, None, habit_ids)
+        runs = streak_runs(db, None, habit_ids)
+        db.execute(update(Habit), [
+            _state_row(habit_id, totals.get(habit_id), runs.get(habit_id))
+            for habit_id in habit_ids
+        ])
+        db.commit()
+
+        processed += len(habit_ids)
+        last_id = habit_ids[-1]
+    return processed
+
+def _state_row(habit_id: int, total, run) -> dict:
+    """Fila de actualización masiva con el estado de rachas de un hábito"""
+    total_completions = total[0] if total else 0
+    last_completed, trailing, longest = run if run else (None, 0, 0)
+    return {
+        "id": habit_id,
+        "total_completions": total_completions,
+        "last_completed": last_completed,
+        "current_streak": trailing,
+        "longest_streak": longest,
+    }
@@ -0,0 +1,6 @@
+"""Benchmarks reproducibles: generador de datos sintéticos, carga por endpoint y comparación con una línea base
+
+    python -m benchmarks seed --database-url sqlite:///bench.db --preset small
+    python -m benchmarks run --database-url sqlite:///bench.db --output results.json
+    python -m benchmarks compare baseline.json results.json
+"""
@@ -0,0 +1,168 @@
+"""python -m benchmarks <seed|run|compare> (desde backend/)"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+from datetime import datetime
+
+# Variables de entorno que cambian el comportamiento medido y se guardan con el resultado
+RECORDED_ENV = (
+    "STATS_CACHE_ENABLED", "FAST_LIST_RESPONSES", "TOKEN_USER_CLAIMS", "USER_CACHE_SIZE",
+    "DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DATABASE_REPLICA_URL",
+)
+
+def _configure(args) -> None:
+    """Fijar el entorno antes de importar la app: los engines se crean al importar"""
+    os.environ["DATABASE_URL"] = args.database_url
+    if getattr(args, "no_cache", False):
+        os.environ["STATS_CACHE_ENABLED"] = "false"
+    logging.basicConfig(level=logging.INFO)
+
+def seed(args) -> None:
+    """Sembrar una población sintética en una base de datos vacía"""
+    _configure(args)
+    from benchmarks.generator import PRESETS, Population, seed_population
+    from app.database.database import engine
+
+    sizes = dict(PRESETS[args.preset])
+    for name in ("users", "habits_per_user", "days"):
+        if getattr(args, name) is not None:
+            sizes[name] = getattr(args, name)
+    population = Population(seed=args.seed, **sizes)
+    summary = seed_population(engine, population)
+    print(json.dumps({"population": population.describe(), **summary}, indent=2))
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _dataset(engine) -> dict:
+    from sqlalchemy import func, select
+    from app.models.models import Habit, HabitLog, User
+
+    with engine.connect() as conn:
+        return {
+            "users": conn.execute(select(func.count(User.id))).scalar(),
+            "habits": conn.execute(select(func.count(Habit.id))).scalar(),
+            "logs": conn.execute(select(func.count(HabitLog.id))).scalar(),
+        }
+
+async def _run(args, scenarios, users) -> dict:
+    from benchmarks.runner import count_queries, http_client, in_process_client, run_load, uvicorn_server
+
+    if args.mode == "uvicorn":
+        with uvicorn_server(args.database_url, args.port, args.workers, args.server_log) as base_url:
+            async with http_client(base_url, args.concurrency) as client:
+                results = await run_load(client, scenarios, users, args.requests, args.concurrency, args.warmup, args.seed)
+    else:
+        async with in_process_client() as client:
+            results = await run_load(client, scenarios, users, args.requests, args.concurrency, args.warmup, args.seed)
+    queries = await count_queries(scenarios, users, args.query_probes, args.seed)
+    for name, result in results.items():
+        result["queries_per_request"] = queries.get(name)
+    return results
+
+def run(args) -> None:
+    """Medir los escenarios y escribir el resultado en JSON"""
+    _configure(args)
+    # Sin el log de acceso muestreado ni el de arranque, que ensucian la salida
+    logging.getLogger("app.access").setLevel(logging.WARNING)
+    logging.getLogger("app.main").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    from benchmarks.runner import SCENARIOS, load_users
+    from app.database.database import engine
+
+    scenarios = [scenario for scenario in SCENARIOS if not args.scenario or scenario.name in args.scenario]
+    if not scenarios:
+        raise SystemExit(f"No scenario matches; available: {', '.join(scenario.name for scenario in SCENARIOS)}")
+    users = load_users(engine, args.sample_users, random.Random(args.seed))
+    endpoints = asyncio.run(_run(args, scenarios, users))
+    result = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": engine.dialect.name,
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "uvicorn" else 1,
+            "concurrency": args.concurrency,
+            "requests_per_endpoint": args.requests,
+            "sample_users": len(users),
+            "seed": args.seed,
+            "dataset": _dataset(engine),
+            "env": {name: os.environ[name] for name in RECORDED_ENV if name in os.environ},
+        },
+        "endpoints": endpoints,
+    }
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    print(output)
+
+def compare(args) -> None:
+    """Comparar un resultado con la línea base; sale con error si hay regresiones"""
+    from benchmarks.compare import compare as compare_results, format_table
+
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    with open(args.current) as handle:
+        current = json.load(handle)
+    rows, regressions = compare_results(baseline, current, args.tolerance)
+    print(format_table(rows))
+    if regressions:
+        print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}:")
+        print(format_table(regressions))
+        raise SystemExit(1)
+
+def main(argv=None):
+    from benchmarks.generator import PRESETS
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Habit Tracker benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_seed = subparsers.add_parser("seed", help="Seed an empty database with a synthetic population")
+    parser_seed.add_argument("--database-url", default="sqlite:///bench.db")
+    parser_seed.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser_seed.add_argument("--users", type=int, default=None, help="Override the preset")
+    parser_seed.add_argument("--habits-per-user", type=int, default=None, help="Override the preset")
+    parser_seed.add_argument("--days", type=int, default=None, help="Override the preset (history length)")
+    parser_seed.add_argument("--seed", type=int, default=42)
+    parser_seed.set_defaults(func=seed)
+
+    parser_run = subparsers.add_parser("run", help="Measure latency, throughput and queries per endpoint")
+    parser_run.add_argument("--database-url", default="sqlite:///bench.db")
+    parser_run.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser_run.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser_run.add_argument("--port", type=int, default=8765)
+    parser_run.add_argument("--server-log", default=None, help="File for the uvicorn output (default: discarded)")
+    parser_run.add_argument("--requests", type=int, default=500, help="Measured requests per endpoint")
+    parser_run.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per endpoint")
+    parser_run.add_argument("--concurrency", type=int, default=10)
+    parser_run.add_argument("--sample-users", type=int, default=50)
+    parser_run.add_argument("--query-probes", type=int, default=5, help="Sequential requests used to count queries")
+    parser_run.add_argument("--scenario", action="append", default=None, help="Only run this scenario (repeatable)")
+    parser_run.add_argument("--no-cache", action="store_true", help="Disable the stats response cache during the load test (query counts never use it)")
+    parser_run.add_argument("--seed", type=int, default=42)
+    parser_run.add_argument("--output", default=None, help="Write the JSON result to this file")
+    parser_run.set_defaults(func=run)
+
+    parser_compare = subparsers.add_parser("compare", help="Compare a result against a stored baseline")
+    parser_compare.add_argument("baseline")
+    parser_compare.add_argument("current")
+    parser_compare.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression (default 0.10)")
+    parser_compare.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Comparación de un resultado con una línea base guardada"""
+from typing import Dict, List, Tuple
+
+# Métrica -> True si más alto es mejor
+METRICS: Dict[str, bool] = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "throughput_rps": True,
+    "queries_per_request": False,
+}
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.10) -> Tuple[List[dict], List[dict]]:
+    """Cambios por endpoint y métrica, y los que empeoran más que ``tolerance``
+
+    Las consultas por petición son deterministas: cualquier aumento es regresión.
+    """
+    rows = []
+    regressions = []
+    for name, result in sorted(current["endpoints"].items()):
+        base = baseline["endpoints"].get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = base.get(metric), result.get(metric)
+            if before is None or after is None:
+                continue
+            if before:
+                change = (after - before) / before
+            else:
+                # Desde cero cualquier aumento es una regresión infinita (p. ej. 0 -> N consultas)
+                change = float("inf") if after > 0 else 0.0
+            worse = -change if higher_is_better else change
+            limit = 0.0 if metric == "queries_per_request" else tolerance
+            row = {"endpoint": name, "metric": metric, "baseline": before, "current": after, "change": round(change, 4)}
+            rows.append(row)
+            if worse > limit:
+                regressions.append(row)
+    return rows, regressions
+
+def format_table(rows: List[dict]) -> str:
+    lines = [f"{'endpoint':<16} {'metric':<20} {'baseline':>12} {'current':>12} {'change':>9}"]
+    for row in rows:
+        lines.append(
+            f"{row['endpoint']:<16} {row['metric']:<20} {row['baseline']:>12} {row['current']:>12} {row['change'] * 100:>8.1f}%"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,144 @@
+"""Generador de poblaciones sintéticas con rachas realistas
+
+Cada hábito sigue una cadena de Markov de dos estados: tras un día completado
+la probabilidad de seguir es alta y tras un fallo es menor, así que salen rachas
+largas y huecos como en el uso real. Todo depende de la semilla.
+"""
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List
+import logging
+import random
+import time
+from sqlalchemy import insert, select
+
+logger = logging.getLogger(__name__)
+
+PRESETS: Dict[str, dict] = {
+    "tiny": {"users": 20, "habits_per_user": 5, "days": 90},
+    "small": {"users": 200, "habits_per_user": 10, "days": 365},
+    "medium": {"users": 2000, "habits_per_user": 20, "days": 730},
+    "large": {"users": 10000, "habits_per_user": 30, "days": 1095},
+}
+
+CATEGORIES = ("health", "fitness", "productivity", "mindfulness", "learning", "social", "creativity", "other")
+BENCHMARK_PASSWORD = "benchmark"
+
+@dataclass
+class Population:
+    users: int
+    habits_per_user: int
+    days: int
+    seed: int = 42
+
+    def describe(self) -> dict:
+        return asdict(self)
+
+def username(index: int) -> str:
+    return f"bench{index}"
+
+def _completions(rng: random.Random, days: int) -> Iterator[int]:
+    """Desplazamientos (días antes de hoy) completados de un hábito"""
+    adherence = rng.betavariate(2, 2)
+    keep_going = min(0.97, 0.55 + adherence * 0.45)
+    restart = 0.05 + adherence * 0.45
+    completed = rng.random() < adherence
+    for offset in range(days - 1, -1, -1):
+        if completed:
+            yield offset
+        completed = rng.random() < (keep_going if completed else restart)
+
+def seed_population(engine, population: Population, chunk_size: int = 20000) -> dict:
+    """Insertar la población en tablas vacías y reconstruir el estado derivado
+
+    Las filas se insertan por bloques con executemany, así que la memoria no
+    depende del tamaño de la población. Devuelve conteos y tiempos.
+    """
+    from app.auth.hashing import pwd_context
+    from app.database.database import Base
+    from app.models.models import Habit, HabitLog, User
+    from sqlalchemy.orm import Session
+    from app.utils.bitmap import rebuild_bitmaps
+    from app.utils.rollups import rebuild_rollups
+    from app.utils.streaks import rebuild_streak_states
+
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(population.seed)
+    today = date.today()
+    # Un solo hash para todos: bcrypt por usuario haría la siembra eterna
+    hashed_password = pwd_context.hash(BENCHMARK_PASSWORD)
+
+    with engine.connect() as conn:
+        if conn.execute(select(User.id).limit(1)).first() is not None:
+            raise RuntimeError("The benchmark database must be empty: seed a fresh one")
+
+    logs: List[dict] = []
+    counts = {"users": 0, "habits": 0, "logs": 0}
+    habit_id = 0
+    for batch_start in range(0, population.users, 500):
+        batch = range(batch_start, min(batch_start + 500, population.users))
+        users = [
+            {
+                "id": index + 1,
+                "email": f"{username(index)}@example.com",
+                "username": username(index),
+                "hashed_password": hashed_password,
+                "is_active": True,
+                "created_at": datetime.utcnow() - timedelta(days=population.days),
+            }
+            for index in batch
+        ]
+        habits = []
+        ages = []
+        for index in batch:
+            for habit_index in range(population.habits_per_user):
+                habit_id += 1
+                # Los hábitos empiezan en momentos distintos del periodo
+                age = rng.randint(max(1, population.days // 4), population.days)
+                ages.append((habit_id, age))
+                habits.append({
+                    "id": habit_id,
+                    "user_id": index + 1,
+                    "name": f"Habit {habit_index}",
+                    "description": "Synthetic habit " * rng.randint(0, 20),
+                    "category": rng.choice(CATEGORIES),
+                    "color": "#10b981",
+                    "goal_frequency": rng.choice((3, 4, 5, 7)),
+                    "is_active": rng.random() > 0.1,
+                    "created_at": datetime.utcnow() - timedelta(days=age),
+                })
+        with engine.begin() as conn:
+            conn.execute(insert(User), users)
+            conn.execute(insert(Habit), habits)
+            for current_habit, age in ages:
+                for offset in _completions(rng, age):
+                    logs.append({
+                        "habit_id": current_habit,
+                        "date": today - timedelta(days=offset),
+                        "completed": True,
+                        "notes": "note" if rng.random() < 0.05 else None,
+                        "created_at": datetime.utcnow(),
+                    })
+                    if len(logs) >= chunk_size:
+                        counts["logs"] += len(logs)
+                        conn.execute(insert(HabitLog), logs)
+                        logs.clear()
+            if logs:
+                counts["logs"] += len(logs)
+                conn.execute(insert(HabitLog), logs)
+                logs.clear()
+        counts["users"] += len(users)
+        counts["habits"] += len(habits)
+        logger.info("Seeded %s/%s users, %s logs", counts["users"], population.users, counts["logs"])
+
+    inserted = time.perf_counter()
+    with Session(engine) as db:
+        rebuild_bitmaps(db)
+        rebuild_streak_states(db)
+        rebuild_rollups(db)
+    return {
+        **counts,
+        "insert_seconds": round(inserted - started, 2),
+        "derived_state_seconds": round(time.perf_counter() - inserted, 2),
+    }
@@ -0,0 +1,236 @@
+"""Carga por endpoint contra la app en proceso (ASGI) o contra un uvicorn local
+
+Para cada escenario se mide la latencia de cada petición con ``concurrency``
+clientes simultáneos (p50/p95/p99, throughput, errores) y, en una pasada
+secuencial aparte dentro del proceso, cuántas consultas SQL hace por petición.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from math import ceil
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Logs existentes por usuario que el escenario de toggle puede invertir
+TOGGLE_KEYS_PER_USER = 50
+
+@dataclass
+class BenchUser:
+    id: int
+    token: str
+    habit_ids: List[int]
+    log_keys: List[Tuple[int, str]]
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: Callable[[random.Random, BenchUser], str]
+    # Peticiones seguidas por elemento del plan: 2 deja las escrituras sin efecto neto
+    repeat: int = 1
+
+def _toggle(rng: random.Random, user: BenchUser) -> str:
+    habit_id, log_date = rng.choice(user.log_keys)
+    return f"/api/logs/habits/{habit_id}/toggle/{log_date}"
+
+SCENARIOS: List[Scenario] = [
+    Scenario("habits.list", "GET", lambda rng, user: "/api/habits/"),
+    Scenario("habits.page", "GET", lambda rng, user: "/api/habits/?cursor=&limit=20"),
+    Scenario("logs.list", "GET", lambda rng, user: f"/api/logs/habits/{rng.choice(user.habit_ids)}/logs?days=365"),
+    Scenario("logs.heatmap", "GET", lambda rng, user: "/api/logs/heatmap"),
+    Scenario("stats.habits", "GET", lambda rng, user: "/api/stats/habits"),
+    Scenario("stats.habit", "GET", lambda rng, user: f"/api/stats/habits/{rng.choice(user.habit_ids)}"),
+    Scenario("stats.overall", "GET", lambda rng, user: "/api/stats/overall"),
+    Scenario("stats.goals", "GET", lambda rng, user: "/api/stats/goals?weeks=12"),
+    Scenario("stats.trend", "GET", lambda rng, user: "/api/stats/trend?days=365&granularity=week"),
+    # Solo días con log (siempre el camino de inversión) y cada uno dos veces: la base queda igual
+    Scenario("logs.toggle", "POST", _toggle, repeat=2),
+]
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Percentil por rango más cercano sobre valores ya ordenados"""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, ceil(q / 100 * len(ordered)) - 1)]
+
+def load_users(engine, sample: int, rng: random.Random) -> List[BenchUser]:
+    """Usuarios de la muestra con un token emitido directamente (sin pasar por bcrypt)"""
+    from sqlalchemy.orm import Session
+    from app.auth.auth import create_access_token, token_claims
+    from app.models.models import Habit, HabitLog, User
+
+    with Session(engine) as db:
+        user_ids = [row.id for row in db.query(User.id).order_by(User.id)]
+        chosen = sorted(rng.sample(user_ids, min(sample, len(user_ids))))
+        habits: Dict[int, List[int]] = {}
+        for habit_id, user_id in db.query(Habit.id, Habit.user_id).filter(Habit.user_id.in_(chosen)).order_by(Habit.id):
+            habits.setdefault(user_id, []).append(habit_id)
+        users = []
+        for user in db.query(User).filter(User.id.in_(chosen)).order_by(User.id):
+            if not habits.get(user.id):
+                continue
+            log_keys = [
+                (habit_id, log_date.isoformat())
+                for habit_id, log_date in db.query(HabitLog.habit_id, HabitLog.date).filter(
+                    HabitLog.habit_id.in_(habits[user.id])
+                ).order_by(HabitLog.id).limit(TOGGLE_KEYS_PER_USER)
+            ]
+            users.append(BenchUser(user.id, create_access_token(data=token_claims(user)), habits[user.id], log_keys))
+    if not users:
+        raise RuntimeError("No users with habits found: seed the database first")
+    return users
+
+async def _drive(client: httpx.AsyncClient, plan: List[List[tuple]], concurrency: int) -> dict:
+    """Ejecutar el plan: cada secuencia la recorre un solo worker, en orden"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    pending = iter(plan)
+
+    async def worker():
+        # Un solo hilo: los workers comparten el iterador sin carreras
+        for sequence in pending:
+            for method, path, token in sequence:
+                started = time.perf_counter()
+                response = await client.request(method, path, headers={"Authorization": f"Bearer {token}"})
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "throughput_rps": round((len(latencies) - errors) / wall, 2) if wall else 0.0,
+    }
+
+def _plan(scenario: Scenario, users: List[BenchUser], count: int, rng: random.Random) -> List[List[tuple]]:
+    """``count`` peticiones (redondeado a múltiplo de ``repeat``) agrupadas en secuencias
+
+    Las lecturas van sueltas. Las escrituras se agrupan por usuario: dos
+    peticiones concurrentes nunca tocan los hábitos del mismo usuario (en
+    SQLite el FOR UPDATE no bloquea y el estado de rachas podría divergir).
+    """
+    if scenario.repeat == 1:
+        plan = []
+        for _ in range(count):
+            user = rng.choice(users)
+            plan.append([(scenario.method, scenario.path(rng, user), user.token)])
+        return plan
+    users = [user for user in users if user.log_keys] or users
+    sequences: Dict[int, List[tuple]] = {}
+    for _ in range(ceil(count / scenario.repeat)):
+        user = rng.choice(users)
+        sequences.setdefault(user.id, []).extend([(scenario.method, scenario.path(rng, user), user.token)] * scenario.repeat)
+    return list(sequences.values())
+
+async def count_queries(scenarios: List[Scenario], users: List[BenchUser], probes: int, seed: int) -> Dict[str, float]:
+    """Consultas SQL por petición de cada escenario, en proceso y de una en una
+
+    La caché de respuestas se desactiva mientras tanto: con ella las
+    estadísticas contarían 0 y una regresión en sus consultas pasaría
+    inadvertida. El mismo plan se ejecuta dos veces y solo se cuenta la
+    segunda, para que la caché de usuarios no dependa del orden de los escenarios.
+    """
+    from sqlalchemy import event
+    from app.database.database import async_engine, replica_engine
+    from app.main import app
+    from app.utils import cache
+
+    executed = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        executed[0] += 1
+
+    engines = [engine.sync_engine for engine in (async_engine, replica_engine) if engine is not None]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    rng = random.Random(seed)
+    counts = {}
+    cache_enabled, cache.STATS_CACHE_ENABLED = cache.STATS_CACHE_ENABLED, False
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for scenario in scenarios:
+                plan = _plan(scenario, users, probes, rng)
+                await _drive(client, plan, 1)
+                executed[0] = 0
+                await _drive(client, plan, 1)
+                counts[scenario.name] = round(executed[0] / sum(len(sequence) for sequence in plan), 2)
+    finally:
+        cache.STATS_CACHE_ENABLED = cache_enabled
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return counts
+
+async def run_load(
+    client: httpx.AsyncClient,
+    scenarios: List[Scenario],
+    users: List[BenchUser],
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    seed: int,
+) -> Dict[str, dict]:
+    """Medir cada escenario por separado, tras unas peticiones de calentamiento"""
+    rng = random.Random(seed)
+    results = {}
+    for scenario in scenarios:
+        if warmup:
+            await _drive(client, _plan(scenario, users, warmup, rng), concurrency)
+        results[scenario.name] = await _drive(client, _plan(scenario, users, requests, rng), concurrency)
+    return results
+
+def in_process_client() -> httpx.AsyncClient:
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+@contextmanager
+def uvicorn_server(database_url: str, port: int, workers: int, log_path: Optional[str] = None) -> Iterator[str]:
+    """Arrancar ``uvicorn app.main:app`` local y esperar a /health; se detiene al salir"""
+    log = open(log_path or os.devnull, "ab")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": database_url}, stdout=log, stderr=log
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("uvicorn did not become healthy within 60 seconds")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+def http_client(base_url: str, concurrency: int) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60)
@@ -0,0 +1,40 @@
+"""Fixtures comunes: la API sobre un SQLite temporal con presupuestos de consultas estrictos"""
+import os
+import tempfile
+
+# Antes de importar la aplicación: los engines se crean al importar app.database
+TEST_DIR = tempfile.mkdtemp(prefix="habit-tracker-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'primary.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URL", None)
+os.environ.pop("ASYNC_DATABASE_REPLICA_URL", None)
+os.environ["QUERY_BUDGET_STRICT"] = "true"
+os.environ["ROLLUP_RECONCILE_SECONDS"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+from app.auth.user_cache import user_cache
+from app.database.database import Base, engine
+from app.main import app
+from app.utils.cache import MemoryCache, set_cache_backend
+
+@pytest.fixture
+def client():
+    """Cliente de la API con una base de datos vacía y cachés limpias"""
+    Base.metadata.drop_all(bind=engine)
+    user_cache.clear()
+    set_cache_backend(MemoryCache())
+    # El lifespan crea las tablas
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def register(client):
+    """Registrar un usuario e iniciar sesión; devuelve las cabeceras de autorización"""
+    def register_user(username: str = "alice") -> dict:
+        password = "pw-123456"
+        client.post("/api/auth/register", json={"email": f"{username}@example.com", "username": username, "password": password})
+        response = client.post("/api/auth/login", json={"username": username, "password": password})
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return register_user
@@ -0,0 +1,19 @@
+from datetime import date
+
+def test_each_operation_reports_its_own_result(client, register):
+    headers = register()
+    habit_id = client.post("/api/habits/", json={"name": "read"}, headers=headers).json()["id"]
+    day = str(date.today())
+    operations = [
+        {"habit_id": habit_id, "date": day, "action": "toggle"},
+        {"habit_id": habit_id, "date": day, "action": "toggle"},
+        {"habit_id": habit_id, "date": day, "completed": True, "notes": "late"},
+        {"habit_id": habit_id + 1, "date": day},
+    ]
+    results = client.post("/api/logs/batch", json={"operations": operations}, headers=headers).json()["results"]
+
+    assert [result["status"] for result in results] == ["created", "updated", "updated", "error"]
+    assert [(result["log"]["completed"], result["log"]["notes"]) for result in results[:3]] == [(True, None), (False, None), (True, "late")]
+    assert len({result["log"]["id"] for result in results[:3]}) == 1
+    saved = client.get(f"/api/logs/habits/{habit_id}/logs", headers=headers).json()
+    assert [(log["completed"], log["notes"]) for log in saved] == [(True, "late")]
@@ -0,0 +1,26 @@
+import gzip
+
+def _import(client, headers, content, filename="logs.csv"):
+    response = client.post("/api/import", files={"file": (filename, content)}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_reimporting_unchanged_rows_skips_them(client, register):
+    headers = register()
+    habit_id = client.post("/api/habits/", json={"name": "read"}, headers=headers).json()["id"]
+    rows = [f"{habit_id},2024-01-0{day},true,note {day}" for day in range(1, 4)]
+    content = "\n".join(["habit_id,date,completed,notes", *rows]).encode()
+
+    first = _import(client, headers, content)
+    assert (first["created"], first["updated"], first["skipped"]) == (3, 0, 0)
+    again = _import(client, headers, gzip.compress(content), "logs.csv.gz")
+    assert (again["created"], again["updated"], again["skipped"]) == (0, 0, 3)
+
+    rows[0] = f"{habit_id},2024-01-01,false,note 1"
+    changed = _import(client, headers, "\n".join(["habit_id,date,completed,notes", *rows]).encode())
+    assert (changed["created"], changed["updated"], changed["skipped"]) == (0, 1, 2)
+
+def test_unreadable_upload_is_rejected(client, register):
+    headers = register()
+    response = client.post("/api/import", files={"file": ("logs.csv.gz", b"\x1f\x8b broken")}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,26 @@
+from datetime import date, timedelta
+from app.routes import logs
+
+def test_truncated_legacy_list_points_to_the_cursor(client, register, monkeypatch):
+    monkeypatch.setattr(logs, "MAX_PAGE_SIZE", 5)
+    headers = register()
+    habit_id = client.post("/api/habits/", json={"name": "read"}, headers=headers).json()["id"]
+    today = date.today()
+    operations = [{"habit_id": habit_id, "date": str(today - timedelta(days=day))} for day in range(12)]
+    client.post("/api/logs/batch", json={"operations": operations}, headers=headers)
+    url = f"/api/logs/habits/{habit_id}/logs"
+
+    response = client.get(url, headers=headers)
+    assert [log["date"] for log in response.json()] == [str(today - timedelta(days=day)) for day in range(5)]
+    remaining = client.get(url, params={"cursor": response.headers["X-Next-Cursor"], "limit": 50}, headers=headers).json()
+    assert [log["date"] for log in remaining["items"]] == [str(today - timedelta(days=day)) for day in range(5, 12)]
+
+    response = client.get(url, params={"days": 3}, headers=headers)
+    assert len(response.json()) == 4
+    assert "X-Next-Cursor" not in response.headers
+
+def test_days_window_is_bounded(client, register):
+    headers = register()
+    habit_id = client.post("/api/habits/", json={"name": "read"}, headers=headers).json()["id"]
+    for days in (0, logs.MAX_LOG_DAYS + 1, 10 ** 12):
+        assert client.get(f"/api/logs/habits/{habit_id}/logs", params={"days": days}, headers=headers).status_code == 422
@@ -0,0 +1,8 @@
+"""Auditoría de planes: ninguna consulta caliente puede recorrer una tabla entera"""
+import pytest
+from app.utils.query_audit import HOT_PATHS, run_audit
+
+@pytest.mark.parametrize("path", sorted(HOT_PATHS))
+def test_hot_path_uses_indexes(path):
+    violations = run_audit("sqlite://", [path])
+    assert violations == [], "\n".join(map(str, violations))
@@ -0,0 +1,87 @@
+"""Consultas por petición: sentencias repetidas y presupuestos de las rutas calientes (QUERY_BUDGET_STRICT: superarlos hace fallar la petición)"""
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import text
+from app.auth.user_cache import user_cache
+from app.database.database import engine
+from app.routes import logs
+from app.utils import events
+from app.utils import query_stats
+from app.utils.query_stats import (
+    BUDGET_EXCEEDED, QUERY_REPEAT_THRESHOLD, REPEATED_STATEMENTS, QueryBudgetExceeded, QueryStats,
+    begin_request, end_request, normalize_statement, report_query_stats
+)
+
+@pytest.fixture
+def habit(client, register):
+    """Un hábito con 60 días de historial; devuelve (id, cabeceras)"""
+    headers = register()
+    habit_id = client.post("/api/habits/", json={"name": "read", "goal_frequency": 3}, headers=headers).json()["id"]
+    today = date.today()
+    operations = [{"habit_id": habit_id, "date": str(today - timedelta(days=day))} for day in range(0, 60, 2)]
+    assert client.post("/api/logs/batch", json={"operations": operations}, headers=headers).status_code == 200
+    return habit_id, headers
+
+def test_in_lists_of_any_length_are_the_same_statement():
+    assert normalize_statement("SELECT * FROM habits\n WHERE id IN (?, ?, ?)") == normalize_statement("SELECT * FROM habits WHERE id IN (?, ?)")
+
+def test_repeated_statements_and_budget_overruns_are_reported():
+    stats = QueryStats(budget=2)
+    stats.statements["SELECT habit_logs.id FROM habit_logs WHERE habit_id = ?"] = QUERY_REPEAT_THRESHOLD
+    stats.count = QUERY_REPEAT_THRESHOLD
+    repeated, exceeded = REPEATED_STATEMENTS.value(route="/test"), BUDGET_EXCEEDED.value(route="/test")
+    report_query_stats(stats, "/test", lambda: {"route": "/test"})
+    assert REPEATED_STATEMENTS.value(route="/test") == repeated + 1
+    assert BUDGET_EXCEEDED.value(route="/test") == exceeded + 1
+
+def test_strict_mode_fails_over_budget(monkeypatch):
+    monkeypatch.setattr(query_stats, "QUERY_BUDGET_STRICT", True)
+    stats, token = begin_request()
+    stats.budget = 1
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            with pytest.raises(QueryBudgetExceeded):
+                conn.execute(text("SELECT 2"))
+    finally:
+        end_request(token)
+    assert stats.count == 1
+
+@pytest.mark.parametrize("path", [
+    "/api/habits/",
+    "/api/habits/?cursor=",
+    "/api/habits/{habit_id}",
+    "/api/logs/habits/{habit_id}/logs",
+    "/api/logs/habits/{habit_id}/logs?cursor=&limit=10",
+    "/api/logs/heatmap",
+    "/api/stats/habits",
+    "/api/stats/habits/{habit_id}",
+    "/api/stats/overall",
+    "/api/stats/goals",
+    "/api/stats/trend?days=90&granularity=week",
+])
+def test_read_routes_stay_within_budget(client, habit, path):
+    habit_id, headers = habit
+    response = client.get(path.format(habit_id=habit_id), headers=headers)
+    assert response.status_code == 200
+
+def test_toggle_stays_within_budget(client, habit):
+    habit_id, headers = habit
+    today = date.today()
+    for day in (0, 1, 0, 30, 90):
+        response = client.post(f"/api/logs/habits/{habit_id}/toggle/{today - timedelta(days=day)}", headers=headers)
+        assert response.status_code == 200
+
+def test_toggle_budget_covers_the_select_without_returning():
+    assert logs.toggle_query_budget("mysql") == logs.toggle_query_budget("sqlite") + 1
+
+def test_toggle_worst_case_stays_within_budget(client, habit, monkeypatch):
+    # Usuario fuera de caché, delta SSE y recálculo de rachas al desmarcar el último día completado
+    monkeypatch.setattr(logs, "has_listeners", lambda user_id: True)
+    monkeypatch.setattr(events, "has_listeners", lambda user_id: True)
+    habit_id, headers = habit
+    today = date.today()
+    for day in (0, 0, 2, 1):
+        user_cache.clear()
+        response = client.post(f"/api/logs/habits/{habit_id}/toggle/{today - timedelta(days=day)}", headers=headers)
+        assert response.status_code == 200
@@ -0,0 +1,64 @@
+import os
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.database import database, pool
+from app.database.database import READS_ROUTED, Base, RecentWriters
+from app.database.pool import TimedAsyncQueuePool, TimedQueuePool, engine_options
+from tests.conftest import TEST_DIR
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Réplica en un segundo archivo SQLite con el esquema pero sin datos (una réplica muy retrasada)"""
+    path = os.path.join(TEST_DIR, "replica.db")
+    if os.path.exists(path):
+        os.remove(path)
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=sync_engine)
+    sync_engine.dispose()
+    replica_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    monkeypatch.setattr(database, "ReplicaSessionLocal", async_sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False))
+
+    def forget_writes():
+        # Como si hubiera pasado DB_REPLICA_STICKY_SECONDS desde la última escritura
+        monkeypatch.setattr(database, "recent_writers", RecentWriters(ttl=60))
+    forget_writes()
+    return forget_writes
+
+def test_reads_go_to_the_replica(client, register, replica):
+    headers = register()
+    client.post("/api/habits/", json={"name": "read"}, headers=headers)
+    replica()
+    # Autenticación en el primario; el listado sale de la réplica vacía
+    routed = READS_ROUTED.value(target="replica")
+    response = client.get("/api/habits/", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == []
+    assert READS_ROUTED.value(target="replica") == routed + 1
+
+def test_reads_after_a_write_stay_on_the_primary(client, register, replica):
+    headers = register()
+    client.post("/api/habits/", json={"name": "read"}, headers=headers)
+    assert [habit["name"] for habit in client.get("/api/habits/", headers=headers).json()] == ["read"]
+
+def test_other_clients_are_not_pinned(client, register, replica):
+    alice, bob = register("alice"), register("bob")
+    replica()
+    client.post("/api/habits/", json={"name": "alice"}, headers=alice)
+    assert client.get("/api/habits/", headers=bob).json() == []
+    assert len(client.get("/api/habits/", headers=alice).json()) == 1
+
+def test_sqlite_keeps_the_driver_pool():
+    options = engine_options("sqlite:///habits.db", "primary")
+    assert "poolclass" not in options
+    assert options["pool_logging_name"] == "primary"
+
+@pytest.mark.parametrize("is_async, poolclass", [(False, TimedQueuePool), (True, TimedAsyncQueuePool)])
+def test_server_databases_use_a_timed_queue_pool(monkeypatch, is_async, poolclass):
+    monkeypatch.setattr(pool, "DB_POOL_SIZE", 7)
+    monkeypatch.setattr(pool, "DB_MAX_OVERFLOW", 3)
+    options = engine_options("mysql+pymysql://user:secret@db/habits", "replica", is_async=is_async)
+    assert options["poolclass"] is poolclass
+    assert (options["pool_size"], options["max_overflow"]) == (7, 3)
+    assert options["pool_pre_ping"] is False
@@ -0,0 +1,27 @@
+from datetime import date, timedelta
+from app.database.database import SessionLocal
+from app.models.models import Habit
+from app.utils.streaks import rebuild_streak_states
+
+def _state(db, habit_id):
+    habit = db.get(Habit, habit_id)
+    db.refresh(habit)
+    return habit.total_completions, habit.last_completed, habit.current_streak, habit.longest_streak
+
+def test_rebuild_matches_the_incremental_state(client, register):
+    headers = register()
+    habit_id = client.post("/api/habits/", json={"name": "read"}, headers=headers).json()["id"]
+    today = date.today()
+    operations = [{"habit_id": habit_id, "date": str(today - timedelta(days=day))} for day in (0, 1, 2, 5, 6, 7, 8, 40)]
+    client.post("/api/logs/batch", json={"operations": operations}, headers=headers)
+    # Romper la racha más larga por el medio fuerza el recálculo
+    client.post(f"/api/logs/habits/{habit_id}/toggle/{today - timedelta(days=6)}", headers=headers)
+
+    db = SessionLocal()
+    try:
+        incremental = _state(db, habit_id)
+        assert incremental == (7, today, 3, 3)
+        assert rebuild_streak_states(db, batch_size=1) == 1
+        assert _state(db, habit_id) == incremental
+    finally:
+        db.close()
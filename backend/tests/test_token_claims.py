@@ -0,0 +1,35 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from jose import jwt
+from sqlalchemy import text
+from app.auth import auth
+from app.auth.user_cache import user_cache
+from app.database.database import engine
+
+@pytest.fixture
+def claims_token(client, register, monkeypatch):
+    """Tokens con claims de usuario emitidos hace ``age`` segundos para un usuario ya desactivado en otro worker"""
+    monkeypatch.setattr(auth, "TOKEN_USER_CLAIMS", True)
+    register()
+    with engine.begin() as conn:
+        user_id = conn.execute(text("SELECT id FROM users WHERE username = 'alice'")).scalar()
+        # Sin pasar por el ORM: este proceso no se entera del cambio
+        conn.execute(text("UPDATE users SET is_active = 0 WHERE id = :id"), {"id": user_id})
+    user_cache.clear()
+
+    def token(age: float) -> dict:
+        claims = {
+            "sub": "alice", "uid": user_id, "active": True,
+            "iat": int(time.time() - age), "exp": datetime.utcnow() + timedelta(hours=1)
+        }
+        return {"Authorization": f"Bearer {jwt.encode(claims, auth.SECRET_KEY, algorithm=auth.ALGORITHM)}"}
+    return token
+
+def test_recent_claims_skip_the_user_lookup(client, claims_token):
+    assert client.get("/api/habits/", headers=claims_token(0)).status_code == 200
+
+def test_old_claims_are_checked_against_the_database(client, claims_token):
+    response = client.get("/api/habits/", headers=claims_token(auth.TOKEN_CLAIMS_MAX_AGE_SECONDS + 60))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"